@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = 'cache_invalidate'
+
+
+class LocalLRUCache:
+    # LRU có TTL trong bộ nhớ của worker, giới hạn số key
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None or item[0] <= time.monotonic():
+                if item is not None:
+                    del self.data[key]
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, timeout=None):
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        if timeout <= 0:
+            return self.delete(key)
+        with self.lock:
+            self.data[key] = (time.monotonic() + timeout, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self.data)}
+
+
+class SharedTier:
+    # Django tạo một instance cache cho mỗi thread, tầng 1 và listener dùng chung cho cả process
+    def __init__(self, max_entries, timeout):
+        self.l1 = LocalLRUCache(max_entries, timeout)
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.origin = uuid.uuid4().hex
+        self.listener = None
+        self.lock = threading.Lock()
+
+
+_shared_tiers = {}
+_shared_tiers_lock = threading.Lock()
+
+
+def shared_tier(name, max_entries, timeout):
+    with _shared_tiers_lock:
+        tier = _shared_tiers.get(name)
+        if tier is None:
+            tier = _shared_tiers[name] = SharedTier(max_entries, timeout)
+        return tier
+
+
+class TwoTierRedisCache(RedisCache):
+    # Tầng 1: LRU trong bộ nhớ từng worker, tầng 2: Redis (django_redis).
+    # Key bị ghi/xóa ở một worker được báo cho các worker khác qua Redis pub/sub để xóa khỏi tầng 1.
+    # Chỉ các key bắt đầu bằng L1_KEY_PREFIXES được giữ ở tầng 1; giá trị trả về từ tầng 1
+    # là object dùng chung nên nơi gọi không được sửa trực tiếp.
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        options = params.get('OPTIONS', {})
+        self.tier = shared_tier(
+            f'{server}:{self.key_prefix}', options.get('L1_MAX_ENTRIES', 10000), options.get('L1_TIMEOUT', 5)
+        )
+        self.l1 = self.tier.l1
+        self.l1_prefixes = tuple(options.get('L1_KEY_PREFIXES', ()))
+
+    def _local(self, key):
+        return not self.l1_prefixes or key.startswith(self.l1_prefixes)
+
+    def _count_l2(self, found, missed):
+        self.tier.l2_hits += found
+        self.tier.l2_misses += missed
+
+    def get(self, key, default=None, version=None, client=None):
+        if not self._local(key):
+            return super().get(key, default=default, version=version, client=client)
+        self.start_listener()
+        full_key = self.make_key(key, version=version)
+        value = self.l1.get(full_key)
+        if value is not None:
+            return value
+        value = super().get(key, default=None, version=version, client=client)
+        self._count_l2(value is not None, value is None)
+        if value is None:
+            return default
+        self.l1.set(full_key, value)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        result, missing = {}, []
+        for key in keys:
+            value = self.l1.get(self.make_key(key, version=version)) if self._local(key) else None
+            if value is None:
+                missing.append(key)
+            else:
+                result[key] = value
+        if missing:
+            self.start_listener()
+            found = super().get_many(missing, version=version, client=client)
+            self._count_l2(len(found), len(missing) - len(found))
+            for key, value in found.items():
+                if self._local(key):
+                    self.l1.set(self.make_key(key, version=version), value)
+            result.update(found)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+        result = super().set(key, value, timeout=timeout, version=version, client=client, nx=nx, xx=xx)
+        self._invalidate([key], version)
+        return result
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().add(key, value, timeout=timeout, version=version, client=client)
+        if result:
+            self._invalidate([key], version)
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().set_many(data, timeout=timeout, version=version, client=client)
+        self._invalidate(list(data), version)
+        return result
+
+    def delete(self, key, version=None, prefix=None, client=None):
+        result = super().delete(key, version=version, prefix=prefix, client=client)
+        self._invalidate([key], version)
+        return result
+
+    def delete_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        result = super().delete_many(keys, version=version, client=client)
+        self._invalidate(keys, version)
+        return result
+
+    def incr(self, key, delta=1, version=None, client=None, ignore_key_check=False):
+        result = super().incr(key, delta=delta, version=version, client=client, ignore_key_check=ignore_key_check)
+        self._invalidate([key], version)
+        return result
+
+    def decr(self, key, delta=1, version=None, client=None):
+        result = super().decr(key, delta=delta, version=version, client=client)
+        self._invalidate([key], version)
+        return result
+
+    def clear(self):
+        result = super().clear()
+        self.l1.clear()
+        self._publish({'clear': True})
+        return result
+
+    def _invalidate(self, keys, version):
+        full_keys = [self.make_key(key, version=version) for key in keys if self._local(key)]
+        if not full_keys:
+            return
+        self.l1.delete(*full_keys)
+        self._publish({'keys': full_keys})
+
+    def _publish(self, payload):
+        payload['origin'] = self.tier.origin
+        try:
+            self.client.get_client(write=True).publish(INVALIDATE_CHANNEL, json.dumps(payload))
+        except Exception as e:
+            logger.error(f'publish cache invalidation failed: {e}')
+
+    def start_listener(self):
+        if self.tier.listener is not None:
+            return
+        with self.tier.lock:
+            if self.tier.listener is None:
+                self.tier.listener = threading.Thread(target=self._listen, name='cache-invalidation-listener', daemon=True)
+                self.tier.listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.get_client(write=False).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATE_CHANNEL)
+                # mất kết nối có thể bỏ lỡ message, xóa tầng 1 để không đọc giá trị cũ
+                self.l1.clear()
+                for message in pubsub.listen():
+                    payload = json.loads(message['data'])
+                    if payload.get('origin') == self.tier.origin:
+                        continue
+                    if payload.get('clear'):
+                        self.l1.clear()
+                    else:
+                        self.l1.delete(*payload.get('keys', ()))
+            except Exception as e:
+                logger.error(f'cache invalidation listener error: {e}')
+                time.sleep(5)
+
+    def stats(self):
+        return {
+            'pid': os.getpid(),
+            'l1': self.l1.stats(),
+            'l2': {'hits': self.tier.l2_hits, 'misses': self.tier.l2_misses},
+        }
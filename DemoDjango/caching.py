@@ -0,0 +1,130 @@
+import hashlib
+import math
+import random
+import time
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+STALE_TTL = 60
+XFETCH_BETA = 1.0
+
+# giá trị cache kèm thời gian tính (delta) và thời điểm hết hạn mềm (expires_at)
+CacheEntry = namedtuple('CacheEntry', ['value', 'delta', 'expires_at'])
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Khởi tạo theo timestamp để khi key version bị evict, version mới vẫn
+        # lớn hơn version cũ và không đọc lại các giá trị cache đã lỗi thời
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    # O(1): không xóa từng key cache, chỉ tăng version, các key cũ tự hết hạn
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        return cache.get(key)
+
+
+def page_key(prefix, version, **params):
+    # mỗi trang (bộ tham số) một key, gắn với version của danh sách
+    raw = '&'.join(f'{k}={params[k]}' for k in sorted(params) if params[k] not in (None, ''))
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{prefix}:v{version}:{digest}'
+
+
+def _lock_key(key):
+    return f'lock:{key}'
+
+
+def _acquire(key):
+    # SET NX: chỉ một request được tính lại giá trị cho mỗi key
+    token = uuid.uuid4().hex
+    if cache.add(_lock_key(key), token, timeout=LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release(key, token):
+    if cache.get(_lock_key(key)) == token:
+        cache.delete(_lock_key(key))
+
+
+def _should_refresh(entry, beta):
+    # XFetch: càng gần hết hạn và giá trị càng tốn thời gian tính thì càng dễ được tính lại sớm,
+    # nên các request không cùng lúc thấy key hết hạn
+    return time.time() - entry.delta * beta * math.log(1 - random.random()) >= entry.expires_at
+
+
+def _store(key, compute, timeout, stale_ttl, cache_none):
+    started = time.time()
+    value = compute()
+    if value is not None or cache_none:
+        delta = time.time() - started
+        cache.set(key, CacheEntry(value, delta, time.time() + timeout), timeout=timeout + stale_ttl)
+    return value
+
+
+def read_through(key, compute, timeout, stale_ttl=STALE_TTL, beta=XFETCH_BETA, cache_none=False):
+    # Đọc cache, khi hết hạn chỉ một request (giữ lock) query DB và ghi lại cache:
+    # - còn giá trị cũ (trong stale_ttl): các request khác trả về giá trị cũ, không chờ
+    # - chưa có giá trị: các request khác chờ request giữ lock ghi xong rồi đọc lại cache
+    entry = cache.get(key)
+    if not isinstance(entry, CacheEntry):
+        entry = None
+    if entry is not None and not _should_refresh(entry, beta):
+        return entry.value
+
+    token = _acquire(key)
+    if token is not None:
+        try:
+            return _store(key, compute, timeout, stale_ttl, cache_none)
+        finally:
+            _release(key, token)
+    if entry is not None:
+        return entry.value
+
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if isinstance(entry, CacheEntry):
+            return entry.value
+        if cache.get(_lock_key(key)) is None:
+            # request giữ lock không ghi cache (lỗi hoặc giá trị None)
+            break
+    return _store(key, compute, timeout, stale_ttl, cache_none)
+
+
+def read_through_many(keys, compute_many, timeout, stale_ttl=STALE_TTL):
+    # Đọc nhiều key bằng một lần get_many, chỉ tính lại các key thiếu bằng một lần compute_many
+    # rồi ghi lại bằng một lần set_many. compute_many(keys) trả về dict key -> value.
+    entries = cache.get_many(keys)
+    result, missing = {}, []
+    for key in keys:
+        entry = entries.get(key)
+        if isinstance(entry, CacheEntry):
+            result[key] = entry.value
+        else:
+            missing.append(key)
+    if missing:
+        started = time.time()
+        values = compute_many(missing)
+        now = time.time()
+        delta = (now - started) / len(missing)
+        if values:
+            cache.set_many(
+                {key: CacheEntry(value, delta, now + timeout) for key, value in values.items()},
+                timeout=timeout + stale_ttl,
+            )
+        result.update(values)
+    return result
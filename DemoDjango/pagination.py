@@ -0,0 +1,101 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort, values):
+    raw = json.dumps({'s': sort, 'v': values}, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if data['s'] != sort or not isinstance(data['v'], list) or len(data['v']) != 2:
+            raise ValueError(cursor)
+        return data['v']
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE, max_size=MAX_PAGE_SIZE):
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except ValueError:
+        raise InvalidCursor('Invalid page_size')
+    return max(1, min(page_size, max_size))
+
+
+def _coerce(model, field, value):
+    # giá trị trong cursor do client gửi lên, ép về đúng kiểu của cột trước khi đưa vào query
+    try:
+        model_field = model._meta.get_field(field)
+        value = model_field.to_python(value)
+        if value is None:
+            raise ValueError(field)
+        model_field.run_validators(value)
+    except (FieldDoesNotExist, ValidationError, ValueError, TypeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+    return value
+
+
+def _value(item, field):
+    return item[field] if isinstance(item, dict) else getattr(item, field)
+
+
+def cursor_paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, sort='id'):
+    # Phân trang keyset theo (sort_field, id): trang sau chỉ là một range scan trên index,
+    # không COUNT(*) và không OFFSET nên trang thứ N tốn như trang đầu.
+    # sort_field phải là cột NOT NULL, '-' ở đầu để sắp xếp giảm dần.
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+    if field == 'id':
+        order = ['-id'] if descending else ['id']
+    else:
+        order = [f'-{field}', '-id'] if descending else [field, 'id']
+    queryset = queryset.order_by(*order)
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        last_id = _coerce(queryset.model, 'id', last_id)
+        op = 'lt' if descending else 'gt'
+        if field == 'id':
+            queryset = queryset.filter(**{f'id__{op}': last_id})
+        else:
+            value = _coerce(queryset.model, field, value)
+            queryset = queryset.filter(
+                Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': last_id})
+            )
+
+    page = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        last = page[-1]
+        next_cursor = encode_cursor(sort, [_value(last, field), _value(last, 'id')])
+    return page, next_cursor
+
+
+def approximate_count(queryset):
+    # Với bảng lớn trên MySQL, lấy số dòng ước lượng từ thống kê của InnoDB thay vì COUNT(*)
+    connection = connections[queryset.db]
+    if connection.vendor == 'mysql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] is not None:
+            return row[0]
+    return queryset.count()
@@ -32,6 +32,10 @@ ALLOWED_HOSTS = []
 
 AUTH_USER_MODEL = 'user.User'
 
+# Kiểm tra quyền qua tập quyền lưu trong cache (user/backends.py)
+AUTHENTICATION_BACKENDS = ['user.backends.CachedPermissionBackend']
+PERMISSION_CACHE_TIMEOUT = 60 * 60
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -148,13 +152,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # như JWTAuthentication nhưng đọc user từ cache, xem user/authentication.py
+        'user.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
+# Thời gian cache user đã xác thực từ JWT (giây), bị xóa khi user được cập nhật
+AUTH_USER_CACHE_TIMEOUT = 60
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -177,18 +185,54 @@ SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
 }
 
+# API bulk sản phẩm: số dòng mỗi câu INSERT/UPDATE và số item tối đa mỗi request
+PRODUCT_BULK_BATCH_SIZE = 1000
+PRODUCT_BULK_MAX_ITEMS = 50000
+
+# Thời gian giữ hàng khi thêm vào giỏ (giây), hết hạn sẽ trả lại stock
+STOCK_RESERVATION_TTL = 15 * 60
+
+# Nơi lưu giỏ hàng: 'sql' (bảng cart) hoặc 'redis' (Redis hash, ghi dồn xuống bảng cart định kỳ)
+CART_BACKEND = 'sql'
+
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/1'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/1'
+CELERY_BEAT_SCHEDULE = {
+    'collect-garbage-blobs': {
+        'task': 'file_upload.tasks.collect_garbage_blobs',
+        'schedule': timedelta(hours=6),
+    },
+    'cleanup-expired-upload-sessions': {
+        'task': 'file_upload.tasks.cleanup_expired_upload_sessions',
+        'schedule': timedelta(minutes=30),
+    },
+    'release-expired-reservations': {
+        'task': 'product.tasks.release_expired_reservations',
+        'schedule': timedelta(minutes=1),
+    },
+    'reconcile-stock': {
+        'task': 'product.tasks.reconcile_stock',
+        'schedule': timedelta(hours=1),
+    },
+    'flush-redis-carts': {
+        'task': 'product.tasks.flush_redis_carts',
+        'schedule': timedelta(seconds=10),
+    },
+}
 
 CACHES = {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        # LRU trong bộ nhớ từng worker (tầng 1) trước Redis (tầng 2), xem DemoDjango/cache_backends.py
+        'BACKEND': 'DemoDjango.cache_backends.TwoTierRedisCache',
         'LOCATION': 'redis://127.0.0.1:6379/0',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
             'KEY_PREFIX': 'django_cache',
+            'L1_MAX_ENTRIES': 10000,
+            'L1_TIMEOUT': 5,
+            'L1_KEY_PREFIXES': ['product_', 'user_list:', 'auth_user_', 'user_perms_'],
         }
     }
 }
@@ -249,5 +293,32 @@ LOGGING = {
     },
 }
 
+# Lưu trữ file upload (blob store)
+FILE_UPLOAD_STORAGE = {
+    'BACKEND': 'file_upload.storage.LocalBlobStore',
+    'OPTIONS': {
+        'location': os.path.join(BASE_DIR, 'media', 'blobs'),
+    },
+}
+
+# Nén dữ liệu khi lưu (chỉ áp dụng cho text/json/csv..., bỏ qua JPEG/ZIP...)
+# ALGORITHM: 'zstd' (cần cài zstandard, nếu không sẽ dùng 'gzip') hoặc 'gzip'
+FILE_UPLOAD_COMPRESSION = {
+    'ENABLED': True,
+    'ALGORITHM': 'zstd',
+    'MIN_SIZE': 1024,
+}
+
+# Upload nhiều phần (resumable): thư mục chứa chunk tạm, thời gian sống của session (giây),
+# kích thước file tối đa (bytes)
+FILE_UPLOAD_CHUNK_DIR = os.path.join(BASE_DIR, 'media', 'chunks')
+FILE_UPLOAD_SESSION_TTL = 24 * 60 * 60
+FILE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024 * 1024
+
+# Giao việc gửi file cho reverse proxy, ví dụ nginx:
+# FILE_DOWNLOAD_OFFLOAD = {'HEADER': 'X-Accel-Redirect', 'PREFIX': '/protected/blobs/'}
+# hoặc apache mod_xsendfile: {'HEADER': 'X-Sendfile'}
+FILE_DOWNLOAD_OFFLOAD = None
+
 # MEDIA_URL = '/media/'
 # MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
@@ -2,10 +2,16 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from rest_framework.permissions import AllowAny
 from user.views import UserViewSet, AuthViewSet, send_email, resend_otp, verify_otp
-from product.views import CartViewSet, get_total_price, product_create, product_update, product_delete, product_get_all, product_get_by_id
+from product.views import (CartViewSet, get_total_price, product_create, product_update, product_delete, product_get_all,
+                           product_get_by_id, product_get_batch, product_bulk_create, product_bulk_update, product_bulk_delete,
+                           product_search, product_export)
 from user.view_permissions import (view_permissions, view_permissions_by_id, add_permission, delete_permission,
-                                   view_group, view_group_by_user_id, add_group, update_group, delete_group)
-from file_upload.views import upload_file, download_file, get_file_path
+                                   view_group, view_group_by_user_id, add_group, update_group, delete_group,
+                                   bulk_add_permissions, bulk_delete_permissions, bulk_add_group_members,
+                                   bulk_delete_group_members, view_users_by_permission_id)
+from file_upload.views import (list_files, export_files, upload_file, download_file, get_file_path, create_upload_session,
+                               upload_session_status, upload_chunk, finalize_upload_session)
+from DemoDjango.views import cache_stats
 from rest_framework import routers, permissions
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_yasg import openapi
@@ -44,6 +50,15 @@ urlpatterns = [
     path('api/FBV/product/delete/<int:id>/', product_delete, name='product_delete'),
     path('api/FBV/product/get_all', product_get_all, name='product_get_all'),
     path('api/FBV/product/get_by_id/<int:id>/', product_get_by_id, name='product_get_by_id'),
+    path('api/product/search/', product_search, name='product_search'),
+    path('api/product/batch', product_get_batch, name='product_get_batch'),
+    path('api/product/export/', product_export, name='product_export'),
+    path('api/FBV/product/bulk_create/', product_bulk_create, name='product_bulk_create'),
+    path('api/FBV/product/bulk_update/', product_bulk_update, name='product_bulk_update'),
+    path('api/FBV/product/bulk_delete/', product_bulk_delete, name='product_bulk_delete'),
+
+    #api cache
+    path('api/cache/stats/', cache_stats, name='cache_stats'),
 
     #api authen
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -52,8 +67,11 @@ urlpatterns = [
     #api permission
     path('api/permission/view_permissions/', view_permissions, name='view_permissions'),
     path('api/permission/view_permissions/<int:id>/', view_permissions_by_id, name='view_permissions_by_id'),
+    path('api/permission/view_users/<int:id>/', view_users_by_permission_id, name='view_users_by_permission_id'),
     path('api/permission/add_permission/', add_permission, name='add_permission'),
     path('api/permission/delete_permission/', delete_permission, name='delete_permission'),
+    path('api/permission/bulk_add/', bulk_add_permissions, name='bulk_add_permissions'),
+    path('api/permission/bulk_delete/', bulk_delete_permissions, name='bulk_delete_permissions'),
 
     #api group
     path('api/group/view_groups/', view_group, name='view_groups'),
@@ -61,6 +79,8 @@ urlpatterns = [
     path('api/group/add_group/', add_group, name='add_group'),
     path('api/group/update_group/', update_group, name='update_group'),
     path('api/group/delete_group/<int:id>/', delete_group, name='delete_group'),
+    path('api/group/bulk_add_members/', bulk_add_group_members, name='bulk_add_group_members'),
+    path('api/group/bulk_delete_members/', bulk_delete_group_members, name='bulk_delete_group_members'),
 
     #api send mail
     path('api/mail/send_mail/', send_email, name='send_email'),
@@ -70,7 +90,15 @@ urlpatterns = [
     path('api/otp/verify_otp/', verify_otp, name='verify_otp'),
 
     #api file upload
+    path('api/file/', list_files, name='list_files'),
+    path('api/file/export/', export_files, name='export_files'),
     path('api/file/upload_file/', upload_file, name='upload_file'),
     path('api/file/download_file/<int:file_id>/', download_file, name='download_file'),
     path('api/file/get_file_path/<int:file_id>/', get_file_path, name='get_file_path'),
+
+    #api resumable upload
+    path('api/file/upload_session/', create_upload_session, name='create_upload_session'),
+    path('api/file/upload_session/<str:session_id>/', upload_session_status, name='upload_session_status'),
+    path('api/file/upload_session/<str:session_id>/chunk/<int:index>/', upload_chunk, name='upload_chunk'),
+    path('api/file/upload_session/<str:session_id>/finalize/', finalize_upload_session, name='finalize_upload_session'),
 ]
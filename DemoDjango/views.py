@@ -0,0 +1,13 @@
+from django.core.cache import cache
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    # số liệu của worker xử lý request này (mỗi worker có tầng 1 riêng)
+    if not hasattr(cache, 'stats'):
+        return Response({'error': 'Cache backend does not report stats'}, status=400)
+    return Response(cache.stats(), status=200)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DemoDjango.settings')
 
 application = get_wsgi_application()
+
+# nạp index tìm kiếm sản phẩm khi worker khởi động
+from product.search import product_index  # noqa: E402
+
+product_index.warm_up()
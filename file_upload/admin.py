@@ -1,4 +1,19 @@
 from django.contrib import admin
-from file_upload.models import UploadedFile
+from file_upload.models import UploadedFile, StoredBlob
 
-admin.site.register(UploadedFile)
\ No newline at end of file
+@admin.register(UploadedFile)
+class UploadedFileAdmin(admin.ModelAdmin):
+    list_display = ['id', 'filename', 'content_type', 'size', 'uploaded_at', 'user']
+    list_select_related = ['user']
+    search_fields = ['filename']
+    # không hiển thị và không load cột data (blob) trong admin
+    exclude = ['data']
+    readonly_fields = ['storage_key', 'size', 'checksum', 'uploaded_at']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('data')
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ['key', 'size', 'stored_size', 'encoding', 'ref_count', 'released_at']
+    readonly_fields = ['key', 'size', 'stored_size', 'encoding', 'ref_count', 'created_at', 'released_at']
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FileUploadConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'file_upload'
+
+    def ready(self):
+        from . import signals  # noqa: F401
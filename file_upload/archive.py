@@ -0,0 +1,65 @@
+import os
+import zipfile
+
+from .compression import is_compressible
+from .storage import CHUNK_SIZE
+
+
+class ZipStream:
+    # file-like chỉ ghi, không seek được: zipfile sẽ tự dùng data descriptor
+    # và generator lấy phần dữ liệu vừa ghi ra để gửi đi ngay
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def archive_name(filename, used):
+    name = os.path.basename((filename or 'file').replace('\\', '/')) or 'file'
+    base, ext = os.path.splitext(name)
+    candidate = name
+    counter = 1
+    while candidate in used:
+        candidate = f'{base} ({counter}){ext}'
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def iter_zip(files):
+    stream = ZipStream()
+    used = set()
+    with zipfile.ZipFile(stream, 'w') as zf:
+        for uploaded_file in files:
+            info = zipfile.ZipInfo(
+                archive_name(uploaded_file.filename, used),
+                date_time=uploaded_file.uploaded_at.timetuple()[:6],
+            )
+            # file đã nén sẵn (ảnh, zip...) chỉ lưu, không nén lại
+            info.compress_type = zipfile.ZIP_DEFLATED if is_compressible(uploaded_file.content_type) else zipfile.ZIP_STORED
+            with uploaded_file.open() as src, zf.open(info, 'w', force_zip64=uploaded_file.size >= zipfile.ZIP64_LIMIT) as dest:
+                while True:
+                    data = src.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    dest.write(data)
+                    chunk = stream.pop()
+                    if chunk:
+                        yield chunk
+            yield stream.pop()
+    yield stream.pop()
@@ -0,0 +1,106 @@
+import gzip
+import zlib
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+IDENTITY = ''
+SUFFIXES = {IDENTITY: '', GZIP: '.gz', ZSTD: '.zst'}
+
+# Chỉ nén các định dạng dạng văn bản, bỏ qua JPEG/PNG/ZIP/video... vốn đã được nén
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/xml',
+    'application/javascript',
+    'application/x-yaml',
+    'application/sql',
+    'image/svg+xml',
+    'image/bmp',
+}
+
+
+def available_encodings():
+    return [GZIP, ZSTD] if zstandard is not None else [GZIP]
+
+
+def compression_settings():
+    return getattr(settings, 'FILE_UPLOAD_COMPRESSION', {})
+
+
+def is_compressible(content_type):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES
+
+
+def choose_encoding(content_type, size=None):
+    config = compression_settings()
+    if not config.get('ENABLED', False):
+        return IDENTITY
+    if size is not None and size < config.get('MIN_SIZE', 1024):
+        return IDENTITY
+    if not is_compressible(content_type):
+        return IDENTITY
+    algorithm = config.get('ALGORITHM', ZSTD)
+    if algorithm == ZSTD and zstandard is None:
+        algorithm = GZIP
+    return algorithm
+
+
+def compressor(encoding):
+    level = compression_settings().get('LEVEL')
+    if encoding == GZIP:
+        return zlib.compressobj(level if level is not None else 6, zlib.DEFLATED, 31)
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=level if level is not None else 3).compressobj()
+    return None
+
+
+def encode_chunks(chunks, encoding):
+    c = compressor(encoding)
+    if c is None:
+        yield from chunks
+        return
+    for chunk in chunks:
+        data = c.compress(chunk)
+        if data:
+            yield data
+    yield c.flush()
+
+
+def decoding_reader(raw, encoding):
+    # trả về file-like giải nén dần, read(n) không giải nén cả file vào RAM
+    if encoding == GZIP:
+        return _ClosingGzipFile(fileobj=raw, mode='rb')
+    if encoding == ZSTD:
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return raw
+
+
+def accepts_encoding(accept_encoding, encoding):
+    for item in (accept_encoding or '').split(','):
+        parts = [p.strip() for p in item.split(';')]
+        if parts[0].lower() != encoding:
+            continue
+        for param in parts[1:]:
+            if param.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                return False
+        return True
+    return False
+
+
+class _ClosingGzipFile(gzip.GzipFile):
+    # GzipFile không đóng fileobj truyền vào, đóng luôn file gốc khi close
+    def close(self):
+        fileobj = self.fileobj
+        try:
+            super().close()
+        finally:
+            if fileobj is not None:
+                fileobj.close()
@@ -0,0 +1,181 @@
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from .storage import CHUNK_SIZE, get_blob_store
+from .compression import accepts_encoding
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    # chỉ hỗ trợ một khoảng byte, header không hợp lệ thì trả về cả file
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    start, end = match.groups()
+    if start == '' and end == '':
+        return None
+    if start == '':
+        # bytes=-N: N byte cuối
+        length = int(end)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = size - 1 if end == '' else min(int(end), size - 1)
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def iter_range(f, start, length, chunk_size=CHUNK_SIZE):
+    try:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def file_etag(uploaded_file, encoding=''):
+    if uploaded_file.checksum:
+        tag = uploaded_file.checksum
+    else:
+        tag = f'{uploaded_file.id}-{int(uploaded_file.uploaded_at.timestamp())}'
+    # mỗi biểu diễn (nén/không nén) cần một strong ETag riêng
+    return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
+
+def iter_file(f, chunk_size=CHUNK_SIZE):
+    try:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        f.close()
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in header.split(',')]
+    return etag in tags or f'W/{etag}' in tags
+
+
+def offload_response(uploaded_file, store):
+    # Giao việc gửi file cho nginx (X-Accel-Redirect) hoặc apache (X-Sendfile)
+    offload = getattr(settings, 'FILE_DOWNLOAD_OFFLOAD', None)
+    if not offload or not uploaded_file.storage_key or not hasattr(store, 'path'):
+        return None
+    header = offload.get('HEADER', 'X-Accel-Redirect')
+    response = HttpResponse(content_type=uploaded_file.content_type)
+    if header == 'X-Accel-Redirect':
+        response[header] = offload['PREFIX'].rstrip('/') + '/' + store.relative_path(uploaded_file.storage_key)
+    else:
+        response[header] = store.path(uploaded_file.storage_key)
+    return response
+
+
+def encoded_response(uploaded_file, store, encoding):
+    # client nhận được dạng nén, gửi thẳng file trên đĩa kèm Content-Encoding
+    raw, actual = store.open_raw(uploaded_file.storage_key)
+    response = FileResponse(raw, content_type=uploaded_file.content_type)
+    response.block_size = CHUNK_SIZE
+    response['Content-Encoding'] = actual
+    # request có Range sẽ nhận bản không nén (xem serve_file)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_file(request, uploaded_file, as_attachment=True):
+    store = get_blob_store()
+    encoding = ''
+    if uploaded_file.storage_key:
+        encoding = store.encoding_of(uploaded_file.storage_key) or ''
+    range_header = request.META.get('HTTP_RANGE')
+    # Range tính trên dữ liệu gốc nên request có Range luôn nhận bản không nén
+    passthrough = (
+        bool(encoding) and not range_header
+        and accepts_encoding(request.META.get('HTTP_ACCEPT_ENCODING'), encoding)
+    )
+    etag = file_etag(uploaded_file, encoding if passthrough else '')
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        if encoding:
+            response['Vary'] = 'Accept-Encoding'
+        return response
+
+    disposition = content_disposition_header(as_attachment, uploaded_file.filename)
+
+    if passthrough:
+        response = encoded_response(uploaded_file, store, encoding)
+        response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = etag
+        response['Content-Disposition'] = disposition
+        return response
+
+    # blob nén cần giải nén nên chỉ blob không nén mới giao cho reverse proxy
+    response = offload_response(uploaded_file, store) if not encoding else None
+    if response is not None:
+        response['ETag'] = etag
+        response['Content-Disposition'] = disposition
+        return response
+
+    # blob nén: open() trả về reader giải nén dần, seek tới vị trí bắt đầu của Range
+    # bằng cách giải nén và bỏ qua phần trước đó
+    f = uploaded_file.open()
+    size = uploaded_file.size if uploaded_file.storage_key else len(f.getbuffer())
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            f.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                iter_range(f, start, length), status=206, content_type=uploaded_file.content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(length)
+            response['Accept-Ranges'] = 'bytes'
+            response['ETag'] = etag
+            response['Content-Disposition'] = disposition
+            if encoding:
+                response['Vary'] = 'Accept-Encoding'
+            return response
+
+    if encoding:
+        # giải nén dần theo từng block, không giữ cả file trong RAM
+        response = StreamingHttpResponse(iter_file(f), content_type=uploaded_file.content_type)
+        response['Vary'] = 'Accept-Encoding'
+    else:
+        # FileResponse stream theo block, wsgi.file_wrapper có thể dùng sendfile
+        response = FileResponse(f, content_type=uploaded_file.content_type)
+        response.block_size = CHUNK_SIZE
+    response['Content-Length'] = str(size)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = disposition
+    return response
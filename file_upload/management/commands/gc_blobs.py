@@ -0,0 +1,15 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from file_upload.models import StoredBlob
+
+
+class Command(BaseCommand):
+    help = 'Delete stored blobs that are no longer referenced by any UploadedFile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help='Only collect blobs released at least this many minutes ago')
+
+    def handle(self, *args, **options):
+        removed = StoredBlob.objects.collect_garbage(grace=timedelta(minutes=options['grace_minutes']))
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} unreferenced blobs'))
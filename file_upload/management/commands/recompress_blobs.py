@@ -0,0 +1,104 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from file_upload.compression import IDENTITY, available_encodings, compression_settings, is_compressible
+from file_upload.models import StoredBlob, UploadedFile
+from file_upload.storage import CHUNK_SIZE, get_blob_store
+
+
+class Command(BaseCommand):
+    help = 'Recompress stored blobs in batches and report the bytes saved'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithm', default=None, help='gzip or zstd (default: FILE_UPLOAD_COMPRESSION["ALGORITHM"])')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--include-legacy', action='store_true',
+                            help='Also move rows still stored in UploadedFile.data into the blob store')
+
+    def handle(self, *args, **options):
+        config = compression_settings()
+        algorithm = options['algorithm'] or config.get('ALGORITHM', 'gzip')
+        if not options['algorithm'] and algorithm not in available_encodings():
+            algorithm = 'gzip'
+        if algorithm not in available_encodings():
+            raise CommandError(f'Compression "{algorithm}" is not available')
+        self.algorithm = algorithm
+        self.min_size = config.get('MIN_SIZE', 1024)
+        self.store = get_blob_store()
+        batch_size = options['batch_size']
+
+        before = after = 0
+        if options['include_legacy']:
+            b, a = self.migrate_legacy(batch_size)
+            before += b
+            after += a
+
+        b, a = self.recompress_blobs(batch_size)
+        before += b
+        after += a
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored size {before} -> {after} bytes, saved {before - after} bytes'
+        ))
+
+    def target_encoding(self, content_type, size):
+        if size >= self.min_size and is_compressible(content_type):
+            return self.algorithm
+        return IDENTITY
+
+    def recompress_blobs(self, batch_size):
+        before = after = 0
+        last_key = ''
+        while True:
+            batch = list(
+                StoredBlob.objects.filter(key__gt=last_key, ref_count__gt=0)
+                .order_by('key')
+                .values('key', 'size', 'encoding', 'stored_size')[:batch_size]
+            )
+            if not batch:
+                break
+            last_key = batch[-1]['key']
+            content_types = dict(
+                UploadedFile.objects.filter(storage_key__in=[blob['key'] for blob in batch])
+                .values_list('storage_key', 'content_type')
+            )
+            for blob in batch:
+                encoding = self.target_encoding(content_types.get(blob['key']), blob['size'])
+                old_size = blob['stored_size'] or blob['size']
+                before += old_size
+                if encoding == blob['encoding']:
+                    after += old_size
+                    continue
+                stored_size = self.store.recompress(blob['key'], encoding)
+                if encoding and stored_size >= blob['size']:
+                    # nén không giảm được dung lượng thì giữ nguyên bản gốc
+                    encoding = IDENTITY
+                    stored_size = self.store.recompress(blob['key'], IDENTITY)
+                StoredBlob.objects.filter(key=blob['key']).update(encoding=encoding, stored_size=stored_size)
+                after += stored_size
+            self.stdout.write(f'Processed blobs up to {last_key}')
+        return before, after
+
+    def migrate_legacy(self, batch_size):
+        before = after = 0
+        last_id = 0
+        while True:
+            batch = list(
+                UploadedFile.objects.filter(storage_key='', id__gt=last_id)
+                .order_by('id')
+                .only('id', 'content_type', 'data')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for uploaded_file in batch:
+                data = bytes(uploaded_file.data or b'')
+                chunks = (data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE))
+                staged = self.store.stage(chunks, encoding=self.target_encoding(uploaded_file.content_type, len(data)))
+                with transaction.atomic():
+                    blob = StoredBlob.objects.acquire(staged)
+                    UploadedFile.objects.filter(id=uploaded_file.id).update(
+                        storage_key=blob.key, size=blob.size, checksum=blob.checksum, data=None
+                    )
+                before += len(data)
+                after += blob.stored_size
+            self.stdout.write(f'Migrated legacy rows up to id={last_id}')
+        return before, after
@@ -1,13 +1,88 @@
-from django.db import models
+import io
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from user.models import User
+from .storage import get_blob_store
+
+class StoredBlobManager(models.Manager):
+    def acquire(self, staged):
+        # Khóa dòng StoredBlob (tạo mới nếu đây là lần upload đầu tiên) rồi mới dùng lại file
+        # cùng nội dung đã có trong store: collect_garbage cũng khóa dòng này trước khi xóa file
+        # nên file không thể bị xóa giữa lúc kiểm tra và lúc tăng số tham chiếu
+        store = get_blob_store()
+        try:
+            with transaction.atomic():
+                self.select_for_update().get_or_create(key=staged.key, defaults={'size': staged.size})
+                blob = store.commit(staged)
+                self.filter(key=blob.key).update(
+                    ref_count=F('ref_count') + 1,
+                    released_at=None,
+                    encoding=blob.encoding,
+                    stored_size=blob.stored_size,
+                )
+        except BaseException:
+            store.discard(staged)
+            raise
+        return blob
+
+    def release(self, key):
+        with transaction.atomic():
+            self.filter(key=key).update(ref_count=F('ref_count') - 1)
+            self.filter(key=key, ref_count__lte=0).update(released_at=timezone.now())
+
+    def collect_garbage(self, grace=timedelta(hours=1)):
+        # Chỉ xóa blob không còn tham chiếu quá thời gian grace, tránh xóa nhầm
+        # blob vừa được một upload khác dùng lại nhưng chưa kịp acquire
+        store = get_blob_store()
+        cutoff = timezone.now() - grace
+        removed = 0
+        keys = self.filter(ref_count__lte=0, released_at__lt=cutoff).values_list('key', flat=True)
+        for key in keys.iterator():
+            with transaction.atomic():
+                # khóa dòng và kiểm tra lại ref_count, xóa file khi vẫn giữ lock để acquire
+                # (cũng khóa dòng này) không dùng lại file đang bị xóa
+                blob = self.select_for_update().filter(key=key, ref_count__lte=0, released_at__lt=cutoff).first()
+                if blob is None:
+                    continue
+                store.delete(key)
+                blob.delete()
+                removed += 1
+        return removed
+
+class StoredBlob(models.Model):
+    key = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField(default=0)
+    # kiểu nén khi lưu ('' = không nén, 'gzip', 'zstd') và dung lượng thực trên đĩa
+    encoding = models.CharField(max_length=16, blank=True, default='')
+    stored_size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    objects = StoredBlobManager()
+
+    def __str__(self):
+        return f'{self.key} ({self.ref_count})'
 
 class UploadedFile(models.Model):
     filename = models.CharField(max_length=1000)
     content_type = models.CharField(max_length=255)
-    data = models.BinaryField()
+    # chỉ còn dùng cho các bản ghi cũ, file mới được lưu trong blob store
+    data = models.BinaryField(blank=True, null=True)
+    storage_key = models.CharField(max_length=255, blank=True, default='')
+    size = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True, default='')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
     def __str__(self):
         return self.filename
 
+    def open(self):
+        if self.storage_key:
+            return get_blob_store().open(self.storage_key)
+        return io.BytesIO(bytes(self.data or b''))
+
@@ -0,0 +1,196 @@
+import io
+import math
+import os
+import shutil
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from DemoDjango.redis_client import redis_client
+from .models import UploadedFile, StoredBlob
+from .storage import CHUNK_SIZE, get_blob_store
+from .compression import choose_encoding
+
+SESSION_KEY = 'upload_session:{}'
+SESSION_CHUNKS_KEY = 'upload_session:{}:chunks'
+SESSION_INDEX_KEY = 'upload_sessions'
+DEFAULT_CHUNK_SIZE = 5 * 1024 * 1024
+MIN_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# giới hạn số chunk của một session (danh sách chunk còn thiếu được tính trên range(total_chunks))
+MAX_CHUNKS = 10000
+
+
+class UploadSessionError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def session_ttl():
+    return getattr(settings, 'FILE_UPLOAD_SESSION_TTL', 24 * 60 * 60)
+
+
+def max_upload_size():
+    return getattr(settings, 'FILE_UPLOAD_MAX_SIZE', 10 * 1024 * 1024 * 1024)
+
+
+def count_chunks(size, chunk_size):
+    return max(math.ceil(size / chunk_size), 1)
+
+
+def chunk_dir(session_id):
+    return os.path.join(settings.FILE_UPLOAD_CHUNK_DIR, session_id)
+
+
+def chunk_path(session_id, index):
+    return os.path.join(chunk_dir(session_id), f'{index:08d}')
+
+
+def create_session(user_id, filename, content_type, size, chunk_size=None):
+    chunk_size = min(chunk_size or DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE)
+    session_id = uuid.uuid4().hex
+    total_chunks = count_chunks(size, chunk_size)
+    ttl = session_ttl()
+    pipe = redis_client.pipeline()
+    pipe.hset(SESSION_KEY.format(session_id), mapping={
+        'user_id': user_id,
+        'filename': filename,
+        'content_type': content_type,
+        'size': size,
+        'chunk_size': chunk_size,
+        'total_chunks': total_chunks,
+    })
+    pipe.expire(SESSION_KEY.format(session_id), ttl)
+    pipe.zadd(SESSION_INDEX_KEY, {session_id: time.time() + ttl})
+    pipe.execute()
+    os.makedirs(chunk_dir(session_id), exist_ok=True)
+    return {'session_id': session_id, 'chunk_size': chunk_size, 'total_chunks': total_chunks}
+
+
+def get_session(session_id, user_id):
+    raw = redis_client.hgetall(SESSION_KEY.format(session_id))
+    if not raw:
+        raise UploadSessionError('Upload session not found or expired', status=404)
+    session = {k.decode(): v.decode() for k, v in raw.items()}
+    if int(session['user_id']) != user_id:
+        raise UploadSessionError('Upload session not found or expired', status=404)
+    for field in ('size', 'chunk_size', 'total_chunks'):
+        session[field] = int(session[field])
+    return session
+
+
+def expected_chunk_length(session, index):
+    if index == session['total_chunks'] - 1:
+        return session['size'] - index * session['chunk_size']
+    return session['chunk_size']
+
+
+def received_chunks(session_id):
+    return sorted(int(i) for i in redis_client.smembers(SESSION_CHUNKS_KEY.format(session_id)))
+
+
+def missing_chunks(session, received):
+    return sorted(set(range(session['total_chunks'])) - set(received))
+
+
+def _touch(session_id):
+    # mỗi chunk nhận được sẽ gia hạn session
+    ttl = session_ttl()
+    pipe = redis_client.pipeline()
+    pipe.expire(SESSION_KEY.format(session_id), ttl)
+    pipe.expire(SESSION_CHUNKS_KEY.format(session_id), ttl)
+    pipe.zadd(SESSION_INDEX_KEY, {session_id: time.time() + ttl})
+    pipe.execute()
+
+
+def write_chunk(session, session_id, index, stream):
+    if index < 0 or index >= session['total_chunks']:
+        raise UploadSessionError('Chunk index out of range')
+    expected = expected_chunk_length(session, index)
+    if stream is None:
+        # request.stream là None khi body rỗng hoặc không có Content-Length (chunked)
+        if expected:
+            raise UploadSessionError('Content-Length is required', status=411)
+        stream = io.BytesIO()
+    path = chunk_path(session_id, index)
+    # ghi ra file tạm riêng để các chunk song song hoặc gửi lại không đè lên nhau
+    tmp_path = f'{path}.{uuid.uuid4().hex}.part'
+    written = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while written <= expected:
+                data = stream.read(min(CHUNK_SIZE, expected + 1 - written))
+                if not data:
+                    break
+                written += len(data)
+                f.write(data)
+        if written != expected:
+            raise UploadSessionError(f'Chunk {index} must be exactly {expected} bytes, got {written}')
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    redis_client.sadd(SESSION_CHUNKS_KEY.format(session_id), index)
+    _touch(session_id)
+
+
+def open_chunk(session_id, index):
+    try:
+        return open(chunk_path(session_id, index), 'rb')
+    except FileNotFoundError:
+        # file chunk bị mất (dọn thư mục tạm...), đánh dấu chưa nhận để client gửi lại
+        redis_client.srem(SESSION_CHUNKS_KEY.format(session_id), index)
+        raise UploadSessionError(f'Chunk {index} is missing, upload it again', status=409)
+
+
+def iter_chunks(session_id, total_chunks):
+    for index in range(total_chunks):
+        with open_chunk(session_id, index) as f:
+            while True:
+                data = f.read(CHUNK_SIZE)
+                if not data:
+                    break
+                yield data
+
+
+def finalize_session(session, session_id, user, checksum=None):
+    missing = missing_chunks(session, received_chunks(session_id))
+    if missing:
+        raise UploadSessionError(f'Missing chunks: {missing[:50]}', status=409)
+
+    # ghép các chunk theo thứ tự, stream thẳng vào blob store
+    store = get_blob_store()
+    encoding = choose_encoding(session['content_type'], session['size'])
+    staged = store.stage(iter_chunks(session_id, session['total_chunks']), encoding=encoding)
+    if checksum and checksum.lower() != staged.checksum:
+        store.discard(staged)
+        raise UploadSessionError('Checksum mismatch', status=422)
+    with transaction.atomic():
+        blob = StoredBlob.objects.acquire(staged)
+        uploaded_file = UploadedFile.objects.create(
+            filename=session['filename'],
+            content_type=session['content_type'],
+            storage_key=blob.key,
+            size=blob.size,
+            checksum=blob.checksum,
+            user=user
+        )
+    delete_session(session_id)
+    return uploaded_file
+
+
+def delete_session(session_id):
+    pipe = redis_client.pipeline()
+    pipe.delete(SESSION_KEY.format(session_id), SESSION_CHUNKS_KEY.format(session_id))
+    pipe.zrem(SESSION_INDEX_KEY, session_id)
+    pipe.execute()
+    shutil.rmtree(chunk_dir(session_id), ignore_errors=True)
+
+
+def cleanup_expired_sessions():
+    expired = redis_client.zrangebyscore(SESSION_INDEX_KEY, '-inf', time.time())
+    for session_id in expired:
+        delete_session(session_id.decode())
+    return len(expired)
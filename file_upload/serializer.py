@@ -1,10 +1,33 @@
 from rest_framework import serializers
 from .models import UploadedFile
+from .resumable import DEFAULT_CHUNK_SIZE, MAX_CHUNKS, MAX_CHUNK_SIZE, MIN_CHUNK_SIZE, count_chunks, max_upload_size
 
 class UploadedFileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UploadedFile
-        fields = ['id', 'filename', 'content_type', 'data', 'uploaded_at', 'user']
+        fields = ['id', 'filename', 'content_type', 'size', 'checksum', 'uploaded_at']
 
 class FileUploadDto(serializers.Serializer):
-    file = serializers.FileField(required=True)
\ No newline at end of file
+    file = serializers.FileField(required=True)
+
+class CreateUploadSessionDto(serializers.Serializer):
+    filename = serializers.CharField(max_length=1000)
+    content_type = serializers.CharField(max_length=255, required=False, default='application/octet-stream')
+    size = serializers.IntegerField(min_value=0)
+    chunk_size = serializers.IntegerField(min_value=MIN_CHUNK_SIZE, max_value=MAX_CHUNK_SIZE, required=False)
+
+    def validate_size(self, value):
+        if value > max_upload_size():
+            raise serializers.ValidationError(f'File size must not exceed {max_upload_size()} bytes')
+        return value
+
+    def validate(self, data):
+        if count_chunks(data['size'], data.get('chunk_size') or DEFAULT_CHUNK_SIZE) > MAX_CHUNKS:
+            raise serializers.ValidationError({'chunk_size': f'At most {MAX_CHUNKS} chunks per upload, use a larger chunk_size'})
+        return data
+
+class FinalizeUploadSessionDto(serializers.Serializer):
+    checksum = serializers.CharField(max_length=64, required=False, allow_blank=True)
+
+class ExportFilesDto(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False)
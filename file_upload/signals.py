@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import StoredBlob, UploadedFile
+from .storage import get_blob_store
+
+
+@receiver(post_delete, sender=UploadedFile)
+def release_blob(sender, instance, **kwargs):
+    if not instance.storage_key:
+        return
+    if instance.storage_key == instance.checksum:
+        StoredBlob.objects.release(instance.storage_key)
+    else:
+        # blob lưu theo uuid trước khi có dedup, chỉ có đúng một tham chiếu
+        get_blob_store().delete(instance.storage_key)
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import uuid
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .compression import IDENTITY, SUFFIXES, decoding_reader, encode_chunks
+
+CHUNK_SIZE = 64 * 1024
+
+# Thông tin blob sau khi ghi xong: key lưu trữ, kích thước gốc (bytes), sha256,
+# kiểu nén khi lưu và kích thước thực tế trên đĩa
+BlobInfo = namedtuple('BlobInfo', ['key', 'size', 'checksum', 'encoding', 'stored_size'])
+# Blob đã ghi ra file tạm nhưng chưa đặt vào vị trí theo key (xem StoredBlobManager.acquire)
+StagedBlob = namedtuple('StagedBlob', ['key', 'size', 'checksum', 'encoding', 'stored_size', 'tmp_path'])
+
+
+class BlobStore:
+    def stage(self, chunks, encoding=IDENTITY):
+        raise NotImplementedError
+
+    def commit(self, staged):
+        raise NotImplementedError
+
+    def discard(self, staged):
+        raise NotImplementedError
+
+    def open(self, key):
+        raise NotImplementedError
+
+    def open_raw(self, key):
+        raise NotImplementedError
+
+    def encoding_of(self, key):
+        raise NotImplementedError
+
+    def recompress(self, key, encoding):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, location):
+        self.location = str(location)
+
+    def relative_path(self, key, encoding=IDENTITY):
+        return f'{key[:2]}/{key[2:4]}/{key}{SUFFIXES[encoding]}'
+
+    def path(self, key, encoding=IDENTITY):
+        return os.path.join(self.location, key[:2], key[2:4], f'{key}{SUFFIXES[encoding]}')
+
+    def _tmp_path(self):
+        tmp_dir = os.path.join(self.location, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, f'{uuid.uuid4().hex}.part')
+
+    def _write(self, tmp_path, chunks):
+        stored_size = 0
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                stored_size += len(chunk)
+                f.write(chunk)
+        return stored_size
+
+    def stage(self, chunks, encoding=IDENTITY):
+        # Ghi từng chunk xuống file tạm, vừa ghi vừa tính sha256 trên dữ liệu gốc
+        # (trước khi nén). Key chính là digest nên nội dung trùng chỉ được lưu một lần.
+        tmp_path = self._tmp_path()
+        digest = hashlib.sha256()
+        size = 0
+
+        def hashed(chunks):
+            nonlocal size
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                yield chunk
+
+        try:
+            stored_size = self._write(tmp_path, encode_chunks(hashed(chunks), encoding))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        key = digest.hexdigest()
+        return StagedBlob(key, size, key, encoding, stored_size, tmp_path)
+
+    def commit(self, staged):
+        # Dùng lại file cùng nội dung nếu đã có, ngược lại chuyển file tạm vào vị trí theo key.
+        # Nơi gọi phải giữ lock dòng StoredBlob để gc không xóa file giữa lúc kiểm tra và lúc dùng.
+        existing = self.encoding_of(staged.key)
+        if existing is not None:
+            self.discard(staged)
+            stored_size = os.path.getsize(self.path(staged.key, existing))
+            return BlobInfo(staged.key, staged.size, staged.checksum, existing, stored_size)
+        path = self.path(staged.key, staged.encoding)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(staged.tmp_path, path)
+        return BlobInfo(staged.key, staged.size, staged.checksum, staged.encoding, staged.stored_size)
+
+    def discard(self, staged):
+        if os.path.exists(staged.tmp_path):
+            os.remove(staged.tmp_path)
+
+    def encoding_of(self, key):
+        for encoding in SUFFIXES:
+            if os.path.exists(self.path(key, encoding)):
+                return encoding
+        return None
+
+    def open_raw(self, key):
+        # file đúng như lưu trên đĩa kèm kiểu nén, dùng để gửi thẳng với Content-Encoding
+        for encoding in SUFFIXES:
+            try:
+                return open(self.path(key, encoding), 'rb'), encoding
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(key)
+
+    def open(self, key):
+        raw, encoding = self.open_raw(key)
+        return decoding_reader(raw, encoding)
+
+    def recompress(self, key, encoding):
+        current = self.encoding_of(key)
+        if current is None:
+            raise FileNotFoundError(key)
+        if current == encoding:
+            return os.path.getsize(self.path(key, current))
+        tmp_path = self._tmp_path()
+        try:
+            with self.open(key) as f:
+                stored_size = self._write(tmp_path, encode_chunks(iter(lambda: f.read(CHUNK_SIZE), b''), encoding))
+            os.replace(tmp_path, self.path(key, encoding))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.remove(self.path(key, current))
+        return stored_size
+
+    def delete(self, key):
+        for encoding in SUFFIXES:
+            try:
+                os.remove(self.path(key, encoding))
+            except FileNotFoundError:
+                pass
+
+    def exists(self, key):
+        return self.encoding_of(key) is not None
+
+
+@lru_cache(maxsize=None)
+def get_blob_store():
+    config = settings.FILE_UPLOAD_STORAGE
+    backend = import_string(config['BACKEND'])
+    return backend(**config.get('OPTIONS', {}))
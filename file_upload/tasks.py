@@ -0,0 +1,18 @@
+import logging
+from celery import shared_task
+from .models import StoredBlob
+from .resumable import cleanup_expired_sessions
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def collect_garbage_blobs():
+    removed = StoredBlob.objects.collect_garbage()
+    logger.info(f'removed {removed} unreferenced blobs')
+    return {'removed': removed}
+
+@shared_task
+def cleanup_expired_upload_sessions():
+    removed = cleanup_expired_sessions()
+    logger.info(f'removed {removed} expired upload sessions')
+    return {'removed': removed}
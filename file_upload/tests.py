@@ -1,3 +1,174 @@
-from django.test import TestCase
+import gzip
+import shutil
+import tempfile
+import unittest
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from DemoDjango.redis_client import redis_client
+from user.models import User
+from . import resumable
+from .models import StoredBlob, UploadedFile
+from .storage import get_blob_store
+from .views import (download_file, create_upload_session, upload_session_status, upload_chunk,
+                    finalize_upload_session)
+
+
+def redis_available():
+    try:
+        return redis_client.ping()
+    except Exception:
+        return False
+
+
+class BlobStoreTestCase(TestCase):
+    # mỗi test một thư mục blob store riêng, nén gzip cho các file văn bản
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        overrides = override_settings(
+            FILE_UPLOAD_STORAGE={'BACKEND': 'file_upload.storage.LocalBlobStore', 'OPTIONS': {'location': f'{self.tmp}/blobs'}},
+            FILE_UPLOAD_CHUNK_DIR=f'{self.tmp}/chunks',
+            FILE_UPLOAD_COMPRESSION={'ENABLED': True, 'ALGORITHM': 'gzip', 'MIN_SIZE': 10},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        get_blob_store.cache_clear()
+        self.addCleanup(get_blob_store.cache_clear)
+        self.user = User.objects.create(username='owner', password='x', is_active=True)
+
+    def download(self, file_id, **headers):
+        request = APIRequestFactory().get('/', **headers)
+        force_authenticate(request, self.user)
+        return download_file(request, file_id=file_id)
+
+
+class RangeDownloadTests(BlobStoreTestCase):
+    def store(self, data, content_type, encoding=''):
+        staged = get_blob_store().stage([data], encoding=encoding)
+        blob = StoredBlob.objects.acquire(staged)
+        return UploadedFile.objects.create(
+            filename='f', content_type=content_type, storage_key=blob.key,
+            size=blob.size, checksum=blob.checksum, user=self.user,
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.data = bytes(range(256)) * 40
+        self.plain = self.store(self.data, 'application/octet-stream')
+        self.compressed = self.store(b'hello range ' * 1000, 'text/plain', encoding='gzip')
+
+    def test_range(self):
+        response = self.download(self.plain.id, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.data[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.data)}')
+        self.assertEqual(response['Content-Length'], '10')
+
+    def test_suffix_and_open_ended_range(self):
+        response = self.download(self.plain.id, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.data[-5:])
+        response = self.download(self.plain.id, HTTP_RANGE=f'bytes={len(self.data) - 3}-')
+        self.assertEqual(b''.join(response.streaming_content), self.data[-3:])
+
+    def test_range_on_compressed_blob_returns_identity_bytes(self):
+        original = b'hello range ' * 1000
+        response = self.download(self.compressed.id, HTTP_RANGE='bytes=5000-5011', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 206)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), original[5000:5012])
+        self.assertEqual(response['Content-Range'], f'bytes 5000-5011/{len(original)}')
+
+    def test_compressed_blob_sent_as_is_when_client_accepts_encoding(self):
+        response = self.download(self.compressed.id, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'hello range ' * 1000)
+
+    def test_unsatisfiable_range(self):
+        for header in (f'bytes={len(self.data)}-', 'bytes=20-10', 'bytes=-0'):
+            response = self.download(self.plain.id, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_if_range_mismatch_returns_full_file(self):
+        response = self.download(self.plain.id, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_not_modified(self):
+        etag = self.download(self.plain.id)['ETag']
+        self.assertEqual(self.download(self.plain.id, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+@unittest.skipUnless(redis_available(), 'session upload cần Redis')
+class ResumableUploadTests(BlobStoreTestCase):
+    def call(self, view, method, data=None, body=None, **kwargs):
+        factory = APIRequestFactory()
+        if body is not None:
+            request = factory.generic(method, '/', body, content_type='application/octet-stream')
+        else:
+            request = getattr(factory, method.lower())('/', data, format='json')
+        force_authenticate(request, self.user)
+        return view(request, **kwargs)
+
+    def create(self, size, **data):
+        response = self.call(create_upload_session, 'POST', {
+            'filename': 'data.bin', 'content_type': 'application/octet-stream', 'size': size, **data
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.addCleanup(resumable.delete_session, response.data['session_id'])
+        return response.data
+
+    def put(self, session_id, index, body):
+        return self.call(upload_chunk, 'PUT', body=body, session_id=session_id, index=index)
+
+    def finalize(self, session_id, **data):
+        return self.call(finalize_upload_session, 'POST', data, session_id=session_id)
+
+    def test_chunks_out_of_order_complete_upload(self):
+        chunk_size = resumable.MIN_CHUNK_SIZE
+        data = bytes(range(256)) * (chunk_size * 2 // 256) + b'tail'
+        session = self.create(len(data), chunk_size=chunk_size)
+        session_id = session['session_id']
+        self.assertEqual(session['total_chunks'], 3)
+
+        chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        self.assertEqual(self.put(session_id, 2, chunks[2]).status_code, 200)
+        self.assertEqual(self.put(session_id, 0, chunks[0]).status_code, 200)
+        status = self.call(upload_session_status, 'GET', session_id=session_id)
+        self.assertEqual(status.data['received_chunks'], [0, 2])
+        self.assertEqual(status.data['missing_chunks'], [1])
+        self.assertEqual(self.finalize(session_id).status_code, 409)
+
+        # chunk sai kích thước bị từ chối, gửi lại đúng thì được nhận
+        self.assertEqual(self.put(session_id, 1, chunks[1][:-1]).status_code, 400)
+        self.assertEqual(self.put(session_id, 1, chunks[1]).status_code, 200)
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['size'], len(data))
+        self.assertEqual(b''.join(self.download(response.data['id']).streaming_content), data)
+        # session bị xóa sau khi ghép file
+        self.assertEqual(self.call(upload_session_status, 'GET', session_id=session_id).status_code, 404)
+
+    def test_checksum_mismatch(self):
+        session_id = self.create(5)['session_id']
+        self.put(session_id, 0, b'hello')
+        self.assertEqual(self.finalize(session_id, checksum='0' * 64).status_code, 422)
+
+    def test_empty_file(self):
+        session_id = self.create(0)['session_id']
+        self.assertEqual(self.put(session_id, 0, b'').status_code, 200)
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['size'], 0)
+
+    def test_chunk_without_body(self):
+        session_id = self.create(5)['session_id']
+        self.assertEqual(self.put(session_id, 0, b'').status_code, 411)
+        self.assertEqual(self.put(session_id, 1, b'hello').status_code, 400)
+
+    def test_other_user_cannot_use_session(self):
+        session_id = self.create(5)['session_id']
+        self.user = User.objects.create(username='other', password='x', is_active=True)
+        self.assertEqual(self.put(session_id, 0, b'hello').status_code, 404)
@@ -1,20 +1,50 @@
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser
 from drf_yasg import openapi
-from .models import UploadedFile
-from .serializer import FileUploadDto
-import jwt
-from django.conf import settings
-from user.models import User
+from .models import UploadedFile, StoredBlob
+from .serializer import UploadedFileSerializer, FileUploadDto, CreateUploadSessionDto, FinalizeUploadSessionDto, ExportFilesDto
+from .storage import get_blob_store
+from .download import serve_file
+from .compression import choose_encoding
+from .archive import iter_zip
+from rest_framework.response import Response
+from . import resumable
+from DemoDjango.pagination import InvalidCursor, cursor_paginate, get_page_size
+
+LIST_FIELDS = ['id', 'filename', 'content_type', 'size', 'checksum', 'uploaded_at']
+
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('page_size', openapi.IN_QUERY, description="Page size", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('cursor', openapi.IN_QUERY, description="next_cursor from the previous page", type=openapi.TYPE_STRING),
+])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def list_files(request):
+    try:
+        page_size = get_page_size(request, default=50)
+        # chỉ lấy các cột metadata, không bao giờ đọc cột data
+        files, next_cursor = cursor_paginate(
+            UploadedFile.objects.filter(user_id=request.user.id).only(*LIST_FIELDS),
+            cursor=request.GET.get('cursor'), page_size=page_size, sort='-id'
+        )
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=400)
+    serialize = UploadedFileSerializer(files, many=True)
+    return Response({
+        'page_size': page_size,
+        'next_cursor': next_cursor,
+        'result': serialize.data,
+    }, status=200)
 
 @swagger_auto_schema(
     method='post',
     request_body=FileUploadDto,
-    operation_description='Upload a file (save as binary)',
+    operation_description='Upload a file (streamed to blob storage)',
     permission_classes=[IsAuthenticated],
 )
 @api_view(['POST'])
@@ -22,28 +52,26 @@ from user.models import User
 @permission_classes([IsAuthenticated])
 def upload_file(request):
     try:
-        #decode access token
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if not auth_header.startswith('Bearer '):
-            return HttpResponse("Authorization header is missing or invalid", status=401)
-        access_token = auth_header.split(' ')[1]
-        payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=['HS256'])
-        user_id = payload.get('id')
-        if not user_id:
-            return HttpResponse("User ID not found in token", status=401)
-        user = User.objects.get(id=user_id)
-
+        # user đã được xác thực từ JWT (CachedJWTAuthentication), không decode token lại
+        user = request.user
 
         file_serializer = FileUploadDto(data=request.data)
         if file_serializer.is_valid():
             uploaded = request.FILES['file']
 
-            UploadedFile.objects.create(
-                filename=uploaded.name,
-                content_type=uploaded.content_type,
-                data=uploaded.read(),
-                user=user
-            )
+            # stream từng chunk vào blob store (lưu theo sha256), DB chỉ lưu metadata
+            encoding = choose_encoding(uploaded.content_type, uploaded.size)
+            staged = get_blob_store().stage(uploaded.chunks(), encoding=encoding)
+            with transaction.atomic():
+                blob = StoredBlob.objects.acquire(staged)
+                UploadedFile.objects.create(
+                    filename=uploaded.name,
+                    content_type=uploaded.content_type,
+                    storage_key=blob.key,
+                    size=blob.size,
+                    checksum=blob.checksum,
+                    user=user
+                )
 
             return HttpResponse("File uploaded successfully", status=200)
         else:
@@ -53,16 +81,18 @@ def upload_file(request):
 
 @swagger_auto_schema(
     method='get',
-    operation_description='Download a file by ID',
+    operation_description='Download a file by ID (supports Range, If-None-Match)',
+    manual_parameters=[
+        openapi.Parameter('Range', openapi.IN_HEADER, description="bytes=start-end", type=openapi.TYPE_STRING),
+        openapi.Parameter('If-None-Match', openapi.IN_HEADER, description="ETag", type=openapi.TYPE_STRING),
+    ],
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def download_file(request, file_id):
     try:
-        uploaded_file = UploadedFile.objects.get(id=file_id)
-        response = HttpResponse(uploaded_file.data, content_type=uploaded_file.content_type)
-        response['Content-Disposition'] = f'attachment; filename={uploaded_file.filename}'
-        return response
+        uploaded_file = UploadedFile.objects.defer('data').get(id=file_id)
+        return serve_file(request, uploaded_file, as_attachment=True)
     except UploadedFile.DoesNotExist:
         return HttpResponse("File not found", status=404)
     except Exception as e:
@@ -75,9 +105,120 @@ def download_file(request, file_id):
 @api_view(['GET'])
 def get_file_path(request, file_id):
     try:
-        uploaded_file = UploadedFile.objects.get(id=file_id)
-        return HttpResponse(uploaded_file.data, content_type=uploaded_file.content_type)
+        uploaded_file = UploadedFile.objects.defer('data').get(id=file_id)
+        return serve_file(request, uploaded_file, as_attachment=False)
     except UploadedFile.DoesNotExist:
         return None
     except Exception as e:
         return None
+
+@swagger_auto_schema(
+    method='post',
+    request_body=CreateUploadSessionDto,
+    operation_description='Create a resumable upload session',
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_upload_session(request):
+    serialize = CreateUploadSessionDto(data=request.data)
+    if not serialize.is_valid():
+        return Response(serialize.errors, status=400)
+    session = resumable.create_session(request.user.id, **serialize.validated_data)
+    return Response(session, status=201)
+
+@swagger_auto_schema(
+    methods=['get', 'delete'],
+    operation_description='Get received chunks of an upload session (GET), or cancel it and delete its chunks (DELETE)',
+)
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_session_status(request, session_id):
+    try:
+        session = resumable.get_session(session_id, request.user.id)
+    except resumable.UploadSessionError as e:
+        return Response({'error': str(e)}, status=e.status)
+    if request.method == 'DELETE':
+        resumable.delete_session(session_id)
+        return Response({'message': 'Upload session deleted'}, status=200)
+    received = resumable.received_chunks(session_id)
+    return Response({
+        'session_id': session_id,
+        'filename': session['filename'],
+        'size': session['size'],
+        'chunk_size': session['chunk_size'],
+        'total_chunks': session['total_chunks'],
+        'received_chunks': received,
+        'missing_chunks': resumable.missing_chunks(session, received),
+    }, status=200)
+
+@swagger_auto_schema(
+    method='put',
+    operation_description='Upload one chunk (raw request body), chunks may be sent in parallel or out of order',
+)
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+def upload_chunk(request, session_id, index):
+    try:
+        session = resumable.get_session(session_id, request.user.id)
+        resumable.write_chunk(session, session_id, index, request.stream)
+        return Response({'session_id': session_id, 'index': index}, status=200)
+    except resumable.UploadSessionError as e:
+        return Response({'error': str(e)}, status=e.status)
+
+@swagger_auto_schema(
+    method='post',
+    request_body=FinalizeUploadSessionDto,
+    operation_description='Assemble uploaded chunks into a file',
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def finalize_upload_session(request, session_id):
+    serialize = FinalizeUploadSessionDto(data=request.data)
+    if not serialize.is_valid():
+        return Response(serialize.errors, status=400)
+    try:
+        session = resumable.get_session(session_id, request.user.id)
+        uploaded_file = resumable.finalize_session(
+            session, session_id, request.user, checksum=serialize.validated_data.get('checksum')
+        )
+    except resumable.UploadSessionError as e:
+        return Response({'error': str(e)}, status=e.status)
+    return Response({
+        'id': uploaded_file.id,
+        'filename': uploaded_file.filename,
+        'size': uploaded_file.size,
+        'checksum': uploaded_file.checksum,
+    }, status=201)
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('ids', openapi.IN_QUERY, description="Comma separated file ids, all files if omitted", type=openapi.TYPE_STRING),
+    ],
+    operation_description='Download selected (or all) files of the current user as a streamed ZIP',
+)
+@swagger_auto_schema(method='post', request_body=ExportFilesDto)
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def export_files(request):
+    if request.method == 'POST':
+        serialize = ExportFilesDto(data=request.data)
+        if not serialize.is_valid():
+            return Response(serialize.errors, status=400)
+        ids = serialize.validated_data.get('ids')
+    else:
+        try:
+            ids = [int(i) for i in request.GET['ids'].split(',') if i.strip()] if request.GET.get('ids') else None
+        except ValueError:
+            return Response({'error': 'Invalid ids'}, status=400)
+
+    files = UploadedFile.objects.filter(user_id=request.user.id).defer('data').order_by('id')
+    if ids is not None:
+        files = files.filter(id__in=ids)
+    if not files.exists():
+        return Response({'error': 'File not found'}, status=404)
+
+    # zip được tạo dần khi gửi, không build cả archive trong RAM hay trên đĩa
+    response = StreamingHttpResponse(iter_zip(files.iterator(chunk_size=200)), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="files.zip"'
+    return response
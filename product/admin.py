@@ -1,7 +1,14 @@
 from django.contrib import admin
 
-from product.models import Product, Cart
+from product.models import Product, Cart, StockReservation
 
 # Register your models here.
 admin.site.register(Product)
-admin.site.register(Cart)
\ No newline at end of file
+admin.site.register(StockReservation)
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'product', 'quantity']
+    # Cart.__str__ và các cột user/product cần join, tránh query riêng cho từng dòng
+    list_select_related = ['user', 'product']
+    raw_id_fields = ['user', 'product']
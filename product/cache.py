@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from DemoDjango.caching import read_through, get_version, bump_version, page_key
+from .models import Cart
+
+LIST_VERSION_KEY = 'product_list_version'
+LIST_TIMEOUT = 60 * 60
+
+
+def list_version():
+    return get_version(LIST_VERSION_KEY)
+
+
+def bump_list_version():
+    # O(1): không xóa từng trang, chỉ tăng version, các trang cũ tự hết hạn
+    return bump_version(LIST_VERSION_KEY)
+
+
+def list_page_key(version, **params):
+    return page_key('product_list', version, **params)
+
+
+def get_list_page(compute, version=None, **params):
+    # hết hạn hoặc đổi version thì chỉ một request query DB cho mỗi trang
+    key = list_page_key(list_version() if version is None else version, **params)
+    return read_through(key, compute, timeout=LIST_TIMEOUT)
+
+
+CART_TOTAL_KEY = 'cart_total_{}_{}'
+CART_TOTAL_VERSION_KEY = 'cart_total_version_{}'
+CART_TOTAL_TIMEOUT = 60 * 60 * 24
+
+
+def compute_cart_total(user_id):
+    from .cart_store import cart_store, use_redis_cart
+    if use_redis_cart():
+        # giỏ hàng trên Redis có thể chưa được flush xuống bảng cart
+        return cart_store.total(user_id)
+    # một câu aggregate thay cho vòng lặp load từng product (N+1)
+    total = Cart.objects.filter(user_id=user_id).aggregate(
+        total=Sum(F('product__price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    )['total']
+    return total or Decimal('0')
+
+
+def cart_total_key(user_id):
+    return CART_TOTAL_KEY.format(user_id, get_version(CART_TOTAL_VERSION_KEY.format(user_id)))
+
+
+def get_cart_total(user_id):
+    return cache.get(cart_total_key(user_id))
+
+
+def refresh_cart_total(user_id):
+    # đọc version trước khi tính: nếu giỏ hàng đổi trong lúc tính thì giá trị này
+    # được ghi vào key của version cũ và không bao giờ được đọc lại
+    key = cart_total_key(user_id)
+    total = Decimal(compute_cart_total(user_id)).quantize(Decimal('0.01'))
+    cache.add(key, total, timeout=CART_TOTAL_TIMEOUT)
+    return total
+
+
+def cart_totals_changed(user_ids):
+    # ghi: không sửa tổng đã lưu, chỉ tăng version của user sau khi commit, lần đọc sau tính lại
+    user_ids = sorted(set(user_ids))
+
+    def bump():
+        for user_id in user_ids:
+            bump_version(CART_TOTAL_VERSION_KEY.format(user_id))
+
+    if user_ids:
+        transaction.on_commit(bump)
+
+
+def cart_users(product_ids):
+    # các user đang có sản phẩm trong giỏ
+    from .cart_store import cart_store, use_redis_cart
+    user_ids = set(Cart.objects.filter(product_id__in=product_ids).values_list('user_id', flat=True).distinct())
+    if use_redis_cart():
+        # giỏ hàng trên Redis có thể chưa được flush xuống bảng cart
+        user_ids |= cart_store.users_with_products(product_ids)
+    return list(user_ids)
+
+
+def invalidate_cart_totals(product_ids):
+    # giá sản phẩm thay đổi: bỏ tổng đã lưu của các user có sản phẩm đó trong giỏ
+    cart_totals_changed(cart_users(product_ids))
@@ -0,0 +1,226 @@
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from DemoDjango.redis_client import redis_client
+from .models import Cart, Product
+
+logger = logging.getLogger(__name__)
+
+# Cấu trúc dữ liệu giỏ hàng trong Redis:
+#   cart:{user_id}          hash product_id -> quantity
+#   cart:{user_id}:ids      hash product_id -> id dòng cart (trùng với id trong bảng cart)
+#   cart:{user_id}:loaded   đánh dấu đã nạp giỏ hàng từ MySQL
+#   cart:line:{id}          "user_id:product_id", để tìm dòng cart theo id
+#   cart:product:{id}       set user_id đang có sản phẩm trong giỏ (để xóa tổng giỏ hàng khi đổi giá)
+#   cart:next_id            bộ đếm id dòng cart mới
+#   cart:dirty              set user_id có thay đổi chưa ghi xuống MySQL
+CART_KEY = 'cart:{}'
+CART_IDS_KEY = 'cart:{}:ids'
+CART_LOADED_KEY = 'cart:{}:loaded'
+CART_LINE_KEY = 'cart:line:{}'
+CART_PRODUCT_USERS_KEY = 'cart:product:{}'
+CART_NEXT_ID_KEY = 'cart:next_id'
+CART_DIRTY_KEY = 'cart:dirty'
+
+# id mới được cấp trước (INCR) để key cart:line:{id} được khai báo trong KEYS,
+# nếu dòng đã có id (request khác vừa tạo) thì trả về id đó
+LINE_ID_SCRIPT = redis_client.register_script("""
+local id = redis.call('HGET', KEYS[1], ARGV[1])
+if not id then
+    id = ARGV[3]
+    redis.call('HSET', KEYS[1], ARGV[1], id)
+    redis.call('SET', KEYS[2], ARGV[2] .. ':' .. ARGV[1])
+end
+return id
+""")
+
+# bộ đếm id chỉ tăng: đặt bằng ARGV[1] nếu giá trị hiện tại nhỏ hơn
+SEED_NEXT_ID_SCRIPT = redis_client.register_script("""
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+return 1
+""")
+
+SET_QUANTITY_SCRIPT = redis_client.register_script("""
+local quantity
+if ARGV[3] == '1' then
+    quantity = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+else
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    quantity = tonumber(ARGV[2])
+end
+redis.call('SADD', KEYS[2], ARGV[4])
+redis.call('SADD', KEYS[3], ARGV[4])
+return quantity
+""")
+
+REMOVE_LINE_SCRIPT = redis_client.register_script("""
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('DEL', KEYS[3])
+redis.call('SADD', KEYS[4], ARGV[2])
+redis.call('SREM', KEYS[5], ARGV[2])
+return 1
+""")
+
+
+def use_redis_cart():
+    return getattr(settings, 'CART_BACKEND', 'sql') == 'redis'
+
+
+def _line(line_id, user_id, product_id, quantity):
+    return {'id': int(line_id), 'user': int(user_id), 'product': int(product_id), 'quantity': int(quantity)}
+
+
+class RedisCartStore:
+    def __init__(self):
+        self.next_id_seeded = False
+
+    def seed_next_id(self):
+        # id dòng cart mới phải lớn hơn mọi id đã có trong MySQL: bộ đếm = max(bộ đếm, max id)
+        # (khi chạy CART_BACKEND = 'sql', MySQL tự cấp id mà bộ đếm trong Redis không biết)
+        max_id = Cart.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        SEED_NEXT_ID_SCRIPT(keys=[CART_NEXT_ID_KEY], args=[max_id])
+        self.next_id_seeded = True
+
+    def ensure_next_id(self):
+        # seed lại một lần mỗi process (đổi CART_BACKEND cần khởi động lại) và sau mỗi lần flush
+        if not self.next_id_seeded:
+            self.seed_next_id()
+
+    def ensure_loaded(self, user_id):
+        # lần đầu truy cập: nạp giỏ hàng đang có trong MySQL vào Redis
+        if redis_client.exists(CART_LOADED_KEY.format(user_id)):
+            return
+        rows = list(Cart.objects.filter(user_id=user_id).values_list('id', 'product_id', 'quantity'))
+        pipe = redis_client.pipeline()
+        for line_id, product_id, quantity in rows:
+            pipe.hsetnx(CART_KEY.format(user_id), product_id, quantity)
+            pipe.hsetnx(CART_IDS_KEY.format(user_id), product_id, line_id)
+            pipe.set(CART_LINE_KEY.format(line_id), f'{user_id}:{product_id}', nx=True)
+            pipe.sadd(CART_PRODUCT_USERS_KEY.format(product_id), user_id)
+        pipe.set(CART_LOADED_KEY.format(user_id), 1)
+        pipe.execute()
+
+    def line_id(self, user_id, product_id):
+        self.ensure_next_id()
+        self.ensure_loaded(user_id)
+        line_id = redis_client.hget(CART_IDS_KEY.format(user_id), product_id)
+        if line_id is not None:
+            return int(line_id)
+        new_id = redis_client.incr(CART_NEXT_ID_KEY)
+        return int(LINE_ID_SCRIPT(
+            keys=[CART_IDS_KEY.format(user_id), CART_LINE_KEY.format(new_id)], args=[product_id, user_id, new_id]
+        ))
+
+    def add(self, user_id, product_id, quantity):
+        # HINCRBY: thêm cùng sản phẩm nhiều lần sẽ cộng dồn vào một dòng
+        line_id = self.line_id(user_id, product_id)
+        total = SET_QUANTITY_SCRIPT(
+            keys=[CART_KEY.format(user_id), CART_DIRTY_KEY, CART_PRODUCT_USERS_KEY.format(product_id)],
+            args=[product_id, quantity, '1', user_id],
+        )
+        return _line(line_id, user_id, product_id, total)
+
+    def set_quantity(self, user_id, product_id, quantity):
+        line_id = self.line_id(user_id, product_id)
+        SET_QUANTITY_SCRIPT(
+            keys=[CART_KEY.format(user_id), CART_DIRTY_KEY, CART_PRODUCT_USERS_KEY.format(product_id)],
+            args=[product_id, quantity, '0', user_id],
+        )
+        return _line(line_id, user_id, product_id, quantity)
+
+    def get(self, line_id):
+        value = redis_client.get(CART_LINE_KEY.format(line_id))
+        if value is None:
+            return None
+        user_id, product_id = value.decode().split(':')
+        quantity = redis_client.hget(CART_KEY.format(user_id), product_id)
+        if quantity is None:
+            return None
+        return _line(line_id, user_id, product_id, quantity)
+
+    def remove(self, user_id, product_id, line_id):
+        REMOVE_LINE_SCRIPT(
+            keys=[
+                CART_KEY.format(user_id), CART_IDS_KEY.format(user_id), CART_LINE_KEY.format(line_id),
+                CART_DIRTY_KEY, CART_PRODUCT_USERS_KEY.format(product_id),
+            ],
+            args=[product_id, user_id],
+        )
+
+    def lines(self, user_id):
+        self.ensure_loaded(user_id)
+        pipe = redis_client.pipeline()
+        pipe.hgetall(CART_KEY.format(user_id))
+        pipe.hgetall(CART_IDS_KEY.format(user_id))
+        quantities, ids = pipe.execute()
+        return sorted(
+            (_line(ids[product_id], user_id, product_id, quantity) for product_id, quantity in quantities.items() if product_id in ids),
+            key=lambda line: line['id'],
+        )
+
+    def users_with_products(self, product_ids):
+        # user có sản phẩm trong giỏ trên Redis, kể cả giỏ hàng chưa flush xuống bảng cart
+        pipe = redis_client.pipeline()
+        for product_id in product_ids:
+            pipe.smembers(CART_PRODUCT_USERS_KEY.format(product_id))
+        return {int(user_id) for members in pipe.execute() for user_id in members}
+
+    def total(self, user_id):
+        lines = self.lines(user_id)
+        prices = dict(Product.objects.filter(id__in=[line['product'] for line in lines]).values_list('id', 'price'))
+        return sum((prices.get(line['product'], 0) * line['quantity'] for line in lines), Decimal('0'))
+
+    def flush(self, batch_size=500):
+        # write-behind: ghi các giỏ hàng đã thay đổi xuống bảng cart theo lô
+        flushed = 0
+        while True:
+            user_ids = [int(u) for u in redis_client.spop(CART_DIRTY_KEY, batch_size) or []]
+            if not user_ids:
+                self.seed_next_id()
+                return flushed
+            try:
+                self._flush_users(user_ids)
+                flushed += len(user_ids)
+            except Exception:
+                redis_client.sadd(CART_DIRTY_KEY, *user_ids)
+                raise
+
+    def _flush_users(self, user_ids):
+        pipe = redis_client.pipeline()
+        for user_id in user_ids:
+            pipe.hgetall(CART_KEY.format(user_id))
+            pipe.hgetall(CART_IDS_KEY.format(user_id))
+        results = pipe.execute()
+
+        wanted = {}
+        for i, user_id in enumerate(user_ids):
+            quantities, ids = results[2 * i], results[2 * i + 1]
+            for product_id, quantity in quantities.items():
+                if product_id in ids and int(quantity) > 0:
+                    wanted[int(ids[product_id])] = (user_id, int(product_id), int(quantity))
+        existing_products = set(Product.objects.filter(
+            id__in={product_id for _, product_id, _ in wanted.values()}
+        ).values_list('id', flat=True))
+        wanted = {line_id: line for line_id, line in wanted.items() if line[1] in existing_products}
+
+        with transaction.atomic():
+            existing = {row[0]: row[1:] for row in Cart.objects.filter(user_id__in=user_ids).values_list('id', 'user_id', 'product_id', 'quantity')}
+            Cart.objects.filter(id__in=[line_id for line_id in existing if line_id not in wanted]).delete()
+            Cart.objects.bulk_create([
+                Cart(id=line_id, user_id=u, product_id=p, quantity=q)
+                for line_id, (u, p, q) in wanted.items() if line_id not in existing
+            ], batch_size=1000)
+            Cart.objects.bulk_update([
+                Cart(id=line_id, user_id=u, product_id=p, quantity=q)
+                for line_id, (u, p, q) in wanted.items() if line_id in existing and existing[line_id] != (u, p, q)
+            ], ['user_id', 'product_id', 'quantity'], batch_size=1000)
+
+
+cart_store = RedisCartStore()
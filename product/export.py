@@ -0,0 +1,55 @@
+import csv
+import io
+
+from django.core.serializers.json import DjangoJSONEncoder
+from DemoDjango.pagination import cursor_paginate
+from .models import Product
+
+EXPORT_FIELDS = ('id', 'name', 'description', 'price', 'stock', 'updated_at')
+EXPORT_BATCH_SIZE = 5000
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'products.ndjson'),
+    'csv': ('text/csv', 'products.csv'),
+}
+
+
+def iter_rows(updated_since=None, batch_size=EXPORT_BATCH_SIZE):
+    # Đọc theo lô bằng phân trang keyset, mỗi lô là một range scan trên index.
+    # MySQL không có server-side cursor nên iterator() vẫn tải hết kết quả về client,
+    # lấy từng lô thì bộ nhớ chỉ giữ một lô dù bảng có hàng triệu dòng.
+    queryset = Product.objects.values(*EXPORT_FIELDS)
+    sort = 'id'
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+        sort = 'updated_at'
+    cursor = None
+    while True:
+        rows, cursor = cursor_paginate(queryset, cursor=cursor, page_size=batch_size, sort=sort)
+        yield rows
+        if cursor is None:
+            return
+
+
+def iter_ndjson(batches):
+    encoder = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+    for rows in batches:
+        if rows:
+            yield ''.join(encoder.encode(row) + '\n' for row in rows).encode()
+
+
+def iter_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in batches:
+        writer.writerows([row[field] for field in EXPORT_FIELDS[:-1]] + [row['updated_at'].isoformat()] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def iter_export(export_format, updated_since=None, batch_size=EXPORT_BATCH_SIZE):
+    batches = iter_rows(updated_since, batch_size)
+    if export_format == 'csv':
+        return iter_csv(batches)
+    return iter_ndjson(batches)
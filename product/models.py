@@ -7,9 +7,18 @@ class Product(models.Model):
     description = models.CharField(max_length=255, blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
+    # dùng cho ETag/Last-Modified, các câu UPDATE trực tiếp phải tự cập nhật cột này
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'product'
+        # phục vụ phân trang keyset theo (price, id) và (name, id)
+        indexes = [
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['name', 'id']),
+            # export tăng dần theo updated_since
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
     def __str__(self):
         return self.name
@@ -23,4 +32,29 @@ class Cart(models.Model):
         db_table = 'cart'
 
     def __str__(self):
-        return f'{self.user.username} - {self.product.name} - {self.quantity}'
\ No newline at end of file
+        return f'{self.user.username} - {self.product.name} - {self.quantity}'
+
+
+class StockReservation(models.Model):
+    ACTIVE = 'active'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+    STATUS_CHOICES = [(ACTIVE, 'Active'), (COMMITTED, 'Committed'), (RELEASED, 'Released')]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # không tạo FK constraint: với CART_BACKEND = 'redis' dòng cart chỉ có trong bảng sau khi flush
+    cart = models.ForeignKey(Cart, on_delete=models.SET_NULL, blank=True, null=True, db_constraint=False)
+    quantity = models.IntegerField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=ACTIVE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'stock_reservation'
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} x {self.quantity} ({self.status})'
@@ -0,0 +1,115 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import Product, StockReservation
+from .search import publish_changes
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationError(Exception):
+    pass
+
+
+class InsufficientStock(ReservationError):
+    pass
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60))
+
+
+def stock_changed(product_ids):
+    # Chỉ gọi khi sản phẩm hết hàng hoặc có hàng trở lại: xóa cache chi tiết và báo cho index
+    # tìm kiếm (bộ lọc in_stock) sau khi commit. Các lần giữ/trả hàng khác không làm mất cache,
+    # số stock trong cache chi tiết và các trang danh sách được cập nhật khi cache hết hạn.
+    product_ids = sorted(set(product_ids))
+
+    def invalidate():
+        cache.delete_many([f'product_{id}' for id in product_ids])
+        publish_changes(ids=product_ids)
+
+    transaction.on_commit(invalidate)
+
+
+def reserve(product_id, user_id, quantity, cart_id=None):
+    # Giữ hàng bằng câu UPDATE có điều kiện: stock = stock - n WHERE stock > n
+    # (hoặc stock = 0 WHERE stock = n khi lấy hết hàng).
+    # Không đọc stock lên Python nên không bị oversell khi nhiều người mua cùng lúc.
+    # Câu UPDATE đặt cuối transaction để khóa dòng product được giữ ngắn nhất có thể.
+    if quantity <= 0:
+        raise ReservationError('Quantity cannot be negative')
+    with transaction.atomic():
+        reservation = StockReservation.objects.create(
+            product_id=product_id,
+            user_id=user_id,
+            cart_id=cart_id,
+            quantity=quantity,
+            expires_at=timezone.now() + reservation_ttl(),
+        )
+        updated = Product.objects.filter(id=product_id, stock__gt=quantity).update(stock=F('stock') - quantity)
+        if not updated:
+            # lấy hết số hàng còn lại: sản phẩm chuyển sang hết hàng
+            if not Product.objects.filter(id=product_id, stock=quantity).update(stock=0, updated_at=timezone.now()):
+                if not Product.objects.filter(id=product_id).exists():
+                    raise ReservationError('Product does not exist')
+                raise InsufficientStock('Quantity cannot be greater than stock')
+            stock_changed([product_id])
+    return reservation
+
+
+def _release(queryset, status):
+    # chuyển trạng thái có điều kiện rồi trả hàng, mỗi reservation chỉ được trả đúng một lần
+    released = 0
+    per_product = defaultdict(int)
+    with transaction.atomic():
+        rows = list(queryset.filter(status=StockReservation.ACTIVE).select_for_update().values_list('id', 'product_id', 'quantity'))
+        if not rows:
+            return 0
+        StockReservation.objects.filter(id__in=[row[0] for row in rows]).update(status=status)
+        for _, product_id, quantity in rows:
+            per_product[product_id] += quantity
+            released += 1
+        restocked = []
+        for product_id, quantity in sorted(per_product.items()):
+            if not Product.objects.filter(id=product_id, stock__gt=0).update(stock=F('stock') + quantity):
+                # đang hết hàng: sản phẩm có hàng trở lại
+                Product.objects.filter(id=product_id).update(stock=F('stock') + quantity, updated_at=timezone.now())
+                restocked.append(product_id)
+        if restocked:
+            stock_changed(restocked)
+    return released
+
+
+def release_for_cart(cart_id):
+    return _release(StockReservation.objects.filter(cart_id=cart_id), StockReservation.RELEASED)
+
+
+def release_expired(batch_size=1000):
+    total = 0
+    while True:
+        ids = list(
+            StockReservation.objects.filter(status=StockReservation.ACTIVE, expires_at__lte=timezone.now())
+            .order_by('expires_at').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += _release(StockReservation.objects.filter(id__in=ids), StockReservation.RELEASED)
+
+
+def reconcile():
+    # Đối soát: trả hàng cho reservation đã hết hạn mà task định kỳ chưa xử lý,
+    # và ghi log các sản phẩm có stock âm hoặc reservation trỏ tới cart đã bị xóa
+    released = release_expired()
+    orphaned = _release(StockReservation.objects.filter(cart__isnull=True), StockReservation.RELEASED)
+    negative = list(Product.objects.filter(stock__lt=0).values_list('id', flat=True))
+    if negative:
+        logger.error(f'products with negative stock: {negative}')
+    held = StockReservation.objects.filter(status=StockReservation.ACTIVE).aggregate(total=Sum('quantity'))['total'] or 0
+    return {'released': released, 'orphaned': orphaned, 'negative_stock': negative, 'held': held}
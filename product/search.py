@@ -0,0 +1,253 @@
+import bisect
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+
+from DemoDjango.redis_client import redis_client
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+EXACT_BONUS = 2
+MAX_PREFIX_TERMS = 200
+# số token thêm/bớt trong một lần cập nhật vượt ngưỡng này thì sắp xếp lại cả danh sách token
+TERMS_REBUILD_THRESHOLD = 64
+UPDATES_CHANNEL = 'product_search_updates'
+INDEX_FIELDS = ('id', 'name', 'description', 'price', 'stock')
+
+
+def normalize(text):
+    # bỏ dấu tiếng Việt để "dien thoai" tìm được "Điện thoại"
+    text = unicodedata.normalize('NFKD', text.lower().replace('đ', 'd'))
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text or ''))
+
+
+class ProductIndex:
+    # Inverted index trong bộ nhớ của từng worker:
+    # token -> {product_id: weight}, danh sách token đã sắp xếp để tìm theo prefix,
+    # và price/stock của từng sản phẩm để lọc mà không cần query DB.
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()
+        self.postings = {}
+        self.terms = []
+        self.docs = {}
+        self.ready = False
+        self.listener = None
+        self.instance_id = uuid.uuid4().hex
+
+    @property
+    def origin(self):
+        # message do chính worker này publish thì listener bỏ qua (đã cập nhật lúc publish),
+        # kèm pid để các worker fork từ cùng một process (gunicorn --preload) vẫn khác nhau
+        return f'{self.instance_id}:{os.getpid()}'
+
+    def _add(self, postings, docs, id, name, description, price, stock):
+        weights = {}
+        for token in tokenize(name):
+            weights[token] = weights.get(token, 0) + NAME_WEIGHT
+        for token in tokenize(description):
+            weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+        new_terms = []
+        for token, weight in weights.items():
+            posting = postings.get(token)
+            if posting is None:
+                posting = postings[token] = {}
+                new_terms.append(token)
+            posting[id] = weight
+        docs[id] = (price, stock, tuple(weights))
+        return new_terms
+
+    def _remove(self, id):
+        # trả về các token không còn sản phẩm nào, danh sách token được cập nhật sau
+        doc = self.docs.pop(id, None)
+        if doc is None:
+            return []
+        removed_terms = []
+        for token in doc[2]:
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(id, None)
+            if not posting:
+                del self.postings[token]
+                removed_terms.append(token)
+        return removed_terms
+
+    def _update_terms(self, new_terms, removed_terms):
+        # Cập nhật danh sách token một lần cho cả batch: ít token thì chèn/xóa bằng bisect,
+        # nhiều token (bulk) thì sắp xếp lại một lần thay vì insort O(n) cho từng token
+        if len(new_terms) + len(removed_terms) > TERMS_REBUILD_THRESHOLD:
+            self.terms = sorted(self.postings)
+            return
+        for token in removed_terms:
+            if token in self.postings:
+                continue
+            i = bisect.bisect_left(self.terms, token)
+            if i < len(self.terms) and self.terms[i] == token:
+                del self.terms[i]
+        for token in new_terms:
+            if token not in self.postings:
+                continue
+            i = bisect.bisect_left(self.terms, token)
+            if i == len(self.terms) or self.terms[i] != token:
+                self.terms.insert(i, token)
+
+    def build(self):
+        started = time.monotonic()
+        postings, docs = {}, {}
+        for row in Product.objects.values_list(*INDEX_FIELDS).iterator(chunk_size=5000):
+            self._add(postings, docs, *row)
+        with self.lock:
+            self.postings = postings
+            self.terms = sorted(postings)
+            self.docs = docs
+            self.ready = True
+        logger.info(f'product search index built: {len(docs)} products in {time.monotonic() - started:.2f}s')
+
+    def ensure_ready(self):
+        if self.ready:
+            return
+        with self.build_lock:
+            if not self.ready:
+                self.build()
+                self.start_listener()
+
+    def apply_rows(self, rows, ids=()):
+        # rows đã được đọc hết từ DB, không query trong lúc giữ lock để search không phải chờ
+        with self.lock:
+            found = set()
+            new_terms, removed_terms = set(), set()
+            for row in rows:
+                found.add(row[0])
+                removed_terms.update(self._remove(row[0]))
+                new_terms.update(self._add(self.postings, self.docs, *row))
+            for id in set(ids) - found:
+                removed_terms.update(self._remove(id))
+            self._update_terms(new_terms, removed_terms)
+
+    def refresh(self, ids):
+        if not self.ready:
+            return
+        ids = list(ids)
+        self.apply_rows(list(Product.objects.filter(id__in=ids).values_list(*INDEX_FIELDS)), ids)
+
+    def refresh_since(self, last_id):
+        if not self.ready:
+            return
+        self.apply_rows(list(Product.objects.filter(id__gt=last_id).values_list(*INDEX_FIELDS)))
+
+    def _matches(self, term):
+        # khớp đúng token được điểm cao hơn khớp theo prefix
+        scores = {}
+        i = bisect.bisect_left(self.terms, term)
+        expanded = 0
+        while i < len(self.terms) and self.terms[i].startswith(term) and expanded < MAX_PREFIX_TERMS:
+            token = self.terms[i]
+            bonus = EXACT_BONUS if token == term else 1
+            for id, weight in self.postings[token].items():
+                score = weight * bonus
+                if score > scores.get(id, 0):
+                    scores[id] = score
+            i += 1
+            expanded += 1
+        return scores
+
+    def search(self, q, limit, min_price=None, max_price=None, in_stock=False, after=None):
+        terms = sorted(set(tokenize(q)), key=len, reverse=True)
+        if not terms:
+            return []
+        self.ensure_ready()
+        with self.lock:
+            combined = None
+            for term in terms:
+                scores = self._matches(term)
+                if combined is None:
+                    combined = scores
+                else:
+                    small, large = (scores, combined) if len(scores) < len(combined) else (combined, scores)
+                    combined = {id: score + large[id] for id, score in small.items() if id in large}
+                if not combined:
+                    return []
+
+            def candidates():
+                for id, score in combined.items():
+                    price, stock, _ = self.docs[id]
+                    if min_price is not None and price < min_price:
+                        continue
+                    if max_price is not None and price > max_price:
+                        continue
+                    if in_stock and stock <= 0:
+                        continue
+                    key = (-score, id)
+                    if after is not None and key <= after:
+                        continue
+                    yield key
+
+            return [(id, -neg_score) for neg_score, id in heapq.nsmallest(limit, candidates())]
+
+    def warm_up(self):
+        # nạp index khi worker khởi động (wsgi.py/asgi.py) thay vì ở request search đầu tiên
+        threading.Thread(target=self._warm_up, name='product-search-warm-up', daemon=True).start()
+
+    def _warm_up(self):
+        try:
+            self.ensure_ready()
+        except Exception as e:
+            # chưa có bảng product (chưa migrate)...: request search đầu tiên sẽ nạp lại
+            logger.error(f'product search index warm up failed: {e}')
+
+    def start_listener(self):
+        if self.listener is not None:
+            return
+        self.listener = threading.Thread(target=self._listen, name='product-search-listener', daemon=True)
+        self.listener.start()
+
+    def _listen(self):
+        # nhận thay đổi từ các worker khác để cập nhật index tăng dần
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(UPDATES_CHANNEL)
+                for message in pubsub.listen():
+                    payload = json.loads(message['data'])
+                    if payload.get('origin') == self.origin:
+                        continue
+                    if 'ids' in payload:
+                        self.refresh(payload['ids'])
+                    elif 'since' in payload:
+                        self.refresh_since(payload['since'])
+            except Exception as e:
+                logger.error(f'product search listener error: {e}')
+                time.sleep(5)
+
+
+product_index = ProductIndex()
+
+
+def publish_changes(ids=None, since=None):
+    # Cập nhật ngay index của worker hiện tại và báo cho các worker khác qua Redis pub/sub
+    if ids is not None:
+        product_index.refresh(ids)
+        payload = {'ids': list(ids)}
+    else:
+        product_index.refresh_since(since)
+        payload = {'since': since}
+    payload['origin'] = product_index.origin
+    try:
+        redis_client.publish(UPDATES_CHANNEL, json.dumps(payload))
+    except Exception as e:
+        logger.error(f'publish product search update failed: {e}')
@@ -4,7 +4,7 @@ from .models import Product, Cart
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'stock']
+        fields = ['id', 'name', 'description', 'price', 'stock', 'updated_at']
 
 class CartSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,6 +21,16 @@ class ProductCreateDto(serializers.ModelSerializer):
     price = serializers.DecimalField(max_digits=10, decimal_places=2)
     stock = serializers.IntegerField(default=0)
 
+    def validate_stock(self, value):
+        if value < 0:
+            raise serializers.ValidationError('Stock cannot be negative')
+        return value
+
+    def validate_price(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Price cannot be negative')
+        return value
+
 class ProductUpdateDto(serializers.ModelSerializer):
     class Meta:
         model = Product
@@ -30,4 +40,28 @@ class ProductUpdateDto(serializers.ModelSerializer):
     name = serializers.CharField(max_length=100)
     description = serializers.CharField(max_length=255, allow_blank=True, required=False)
     price = serializers.DecimalField(max_digits=10, decimal_places=2)
-    stock = serializers.IntegerField(default=0)
+    stock = serializers.IntegerField(required=False)
+
+    def validate_stock(self, value):
+        if value < 0:
+            raise serializers.ValidationError('Stock cannot be negative')
+        return value
+
+    def validate_price(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Price cannot be negative')
+        return value
+
+class BulkDeleteProductDto(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+class ProductBatchDto(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+class ProductSearchDto(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    in_stock = serializers.BooleanField(required=False, default=False)
+    page_size = serializers.IntegerField(required=False)
+    cursor = serializers.CharField(required=False)
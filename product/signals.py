@@ -0,0 +1,41 @@
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import bump_list_version
+from .models import Product
+from .search import publish_changes
+
+# id các sản phẩm đã thay đổi trong transaction hiện tại của thread
+_pending = threading.local()
+
+
+def invalidate_products(product_ids):
+    # xóa cache chi tiết, đổi version các trang danh sách và cập nhật index tìm kiếm
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return
+    cache.delete_many([f'product_{id}' for id in product_ids])
+    bump_list_version()
+    publish_changes(ids=product_ids)
+
+
+def _flush_pending():
+    invalidate_products(_pending.__dict__.pop('ids', ()))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, using, **kwargs):
+    # Gom các sản phẩm thay đổi trong cùng transaction (queryset.delete() gửi signal cho
+    # từng dòng) để chỉ xóa cache và tăng version danh sách một lần sau khi commit.
+    # Callback bị bỏ khi rollback thì tập id cũ cũng được bỏ.
+    connection = transaction.get_connection(using)
+    registered = any(callback[1] is _flush_pending for callback in connection.run_on_commit)
+    if not registered:
+        _pending.ids = set()
+    _pending.ids.add(instance.id)
+    if not registered:
+        transaction.on_commit(_flush_pending, using=using)
@@ -0,0 +1,28 @@
+import logging
+from celery import shared_task
+from .reservations import release_expired, reconcile
+from .cart_store import cart_store, use_redis_cart
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def release_expired_reservations():
+    released = release_expired()
+    if released:
+        logger.info(f'released {released} expired stock reservations')
+    return {'released': released}
+
+@shared_task
+def reconcile_stock():
+    result = reconcile()
+    logger.info(f'stock reconciliation: {result}')
+    return result
+
+@shared_task
+def flush_redis_carts():
+    if not use_redis_cart():
+        return {'flushed': 0}
+    flushed = cart_store.flush()
+    if flushed:
+        logger.info(f'flushed {flushed} redis carts to database')
+    return {'flushed': flushed}
@@ -1,3 +1,141 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Sum
 from django.test import TestCase
+from django.utils import timezone
+from DemoDjango.pagination import InvalidCursor, cursor_paginate, encode_cursor
+from rest_framework.test import APIRequestFactory, force_authenticate
+from user.models import User
+from .cache import list_version
+from .models import Product, StockReservation
+from .reservations import InsufficientStock, ReservationError, reserve, release_for_cart, release_expired
+from .views import product_get_all, product_update
+
+
+def held(product_id):
+    return StockReservation.objects.filter(product_id=product_id, status=StockReservation.ACTIVE).aggregate(
+        total=Sum('quantity')
+    )['total'] or 0
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer', password='x', is_active=True, is_superuser=True)
+        self.product = Product.objects.create(name='p', price=Decimal('10.00'), stock=5)
+
+    def stock(self):
+        return Product.objects.get(id=self.product.id).stock
+
+    def test_reserve_decrements_stock(self):
+        reservation = reserve(self.product.id, self.user.id, 3, cart_id=1)
+        self.assertEqual(reservation.status, StockReservation.ACTIVE)
+        self.assertEqual(self.stock(), 2)
+        self.assertEqual(held(self.product.id), 3)
+
+    def test_reserve_more_than_stock(self):
+        with self.assertRaises(InsufficientStock):
+            reserve(self.product.id, self.user.id, 6, cart_id=1)
+        self.assertEqual(self.stock(), 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_reserve_invalid(self):
+        with self.assertRaises(ReservationError):
+            reserve(self.product.id, self.user.id, 0)
+        with self.assertRaises(ReservationError):
+            reserve(self.product.id + 100, self.user.id, 1)
+
+    def test_release_returns_stock_once(self):
+        reserve(self.product.id, self.user.id, 3, cart_id=1)
+        self.assertEqual(release_for_cart(1), 1)
+        self.assertEqual(release_for_cart(1), 0)
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.RELEASED)
+
+    def test_release_expired(self):
+        reserve(self.product.id, self.user.id, 2, cart_id=1)
+        reserve(self.product.id, self.user.id, 1, cart_id=2)
+        StockReservation.objects.filter(cart_id=1).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired(), 1)
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual(held(self.product.id), 1)
+
+    def test_cache_invalidated_only_when_availability_changes(self):
+        cache.set(f'product_{self.product.id}', {'stock': 5})
+        version = list_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve(self.product.id, self.user.id, 2, cart_id=1)
+        # vẫn còn hàng: không xóa cache, không đổi version danh sách
+        self.assertIsNotNone(cache.get(f'product_{self.product.id}'))
+        self.assertEqual(list_version(), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve(self.product.id, self.user.id, 3, cart_id=2)
+        self.assertEqual(self.stock(), 0)
+        self.assertIsNone(cache.get(f'product_{self.product.id}'))
+
+        cache.set(f'product_{self.product.id}', {'stock': 0})
+        with self.captureOnCommitCallbacks(execute=True):
+            release_for_cart(2)
+        self.assertEqual(self.stock(), 3)
+        self.assertIsNone(cache.get(f'product_{self.product.id}'))
+        self.assertEqual(list_version(), version)
+
+    def update(self, **data):
+        request = APIRequestFactory().put('/', {'id': self.product.id, 'name': 'p', 'price': '10.00', **data}, format='json')
+        force_authenticate(request, self.user)
+        return product_update(request)
+
+    def test_update_stock_is_available_stock(self):
+        # stock khi cập nhật cùng nghĩa với khi đọc: đọc rồi gửi lại không làm mất phần đang giữ
+        reserve(self.product.id, self.user.id, 3, cart_id=1)
+        response = self.update(stock=self.stock())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock'], 2)
+        self.assertEqual(self.update(stock=self.stock()).status_code, 200)
+        self.assertEqual(self.stock(), 2)
+        release_for_cart(1)
+        self.assertEqual(self.stock(), 5)
+
+    def test_update_without_stock_keeps_stock(self):
+        self.assertEqual(self.update(price='12.00').status_code, 200)
+        self.assertEqual(self.stock(), 5)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        # giá trùng nhau để kiểm tra thứ tự phụ theo id
+        self.products = [
+            Product.objects.create(name=f'p{i}', price=Decimal(price), stock=1)
+            for i, price in enumerate(['3.00', '1.00', '2.00', '1.00', '3.00', '2.00', '1.00'])
+        ]
+
+    def walk(self, sort, page_size=2):
+        ids, cursor = [], None
+        while True:
+            page, cursor = cursor_paginate(Product.objects.all(), cursor=cursor, page_size=page_size, sort=sort)
+            ids.extend(product.id for product in page)
+            if cursor is None:
+                return ids
+
+    def test_pages_cover_all_rows_in_order(self):
+        by_price = sorted(self.products, key=lambda p: (p.price, p.id))
+        self.assertEqual(self.walk('price'), [p.id for p in by_price])
+        self.assertEqual(self.walk('-price'), [p.id for p in reversed(by_price)])
+        self.assertEqual(self.walk('id', page_size=3), [p.id for p in self.products])
+
+    def test_last_page_has_no_cursor(self):
+        page, cursor = cursor_paginate(Product.objects.all(), page_size=len(self.products))
+        self.assertEqual(len(page), len(self.products))
+        self.assertIsNone(cursor)
+
+    def test_invalid_cursor(self):
+        for cursor in ['not-base64!', encode_cursor('id', [1, 2]), encode_cursor('price', ['x', 1]),
+                       encode_cursor('price', ['1.00', 'a']), encode_cursor('price', [None, 1])]:
+            with self.assertRaises(InvalidCursor):
+                cursor_paginate(Product.objects.all(), cursor=cursor, sort='price')
 
-# Create your tests here.
+    def test_view_rejects_invalid_cursor(self):
+        request = APIRequestFactory().get('/', {'sort': 'price', 'cursor': encode_cursor('price', ['x', 1])})
+        self.assertEqual(product_get_all(request).status_code, 400)
@@ -1,16 +1,35 @@
+from decimal import Decimal
 from django.contrib.auth.decorators import permission_required
 from django.shortcuts import render
 from rest_framework import viewsets
-from rest_framework.decorators import api_view, permission_classes
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.db import IntegrityError, transaction
+from rest_framework.decorators import action, api_view, permission_classes, parser_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated, AllowAny, DjangoModelPermissions
 from .models import Product, Cart
 from user.models import User
-from .serializer import ProductSerializer, CartSerializer, ProductCreateDto, ProductUpdateDto
+from .serializer import (ProductSerializer, CartSerializer, ProductCreateDto, ProductUpdateDto, BulkDeleteProductDto,
+                         ProductSearchDto, ProductBatchDto)
+from .parsers import NDJSONParser
+from .export import EXPORT_FORMATS, iter_export
+from .search import product_index, publish_changes
+from .signals import invalidate_products
+from .reservations import ReservationError, reserve, release_for_cart
+from .cart_store import cart_store, use_redis_cart
 from rest_framework.response import Response
-from django.core.paginator import Paginator
+from DemoDjango.pagination import (InvalidCursor, cursor_paginate, get_page_size, approximate_count,
+                                   encode_cursor, decode_cursor)
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from DemoDjango.conditional import make_etag, not_modified, set_validators
+from DemoDjango.caching import read_through, read_through_many
+from .cache import (get_list_page, list_version, bump_list_version, get_cart_total, refresh_cart_total,
+                    cart_totals_changed, invalidate_cart_totals, cart_users)
 
 # Create your views here.
 @swagger_auto_schema(method='post', request_body=ProductCreateDto)
@@ -38,16 +57,18 @@ def product_update(request):
 
     if product is None:
         return Response({'error': 'Product does not exist'}, status=400)
-    if int(request.data['stock']) < 0:
+    if int(request.data.get('stock', 0)) < 0:
         return Response({'error': 'Stock cannot be negative'}, status=400)
     if float(request.data['price']) <= 0:
         return Response({'error': 'Price cannot be negative'}, status=400)
 
     serialize = ProductUpdateDto(product, data=request.data, context=({'request': request}))
-    cache_keys = [f'product_{product.id}', 'product_list']
+    old_price = product.price
     if serialize.is_valid():
-        serialize.save()
-        cache.delete_many(cache_keys)
+        # stock là số hàng còn có thể đặt (giống khi đọc), phần đang được giữ trong giỏ hàng không tính vào
+        product = serialize.save()
+        if product.price != old_price:
+            invalidate_cart_totals([product.id])
         return Response(serialize.data, status=200)
 
     return Response(serialize.errors, status=400)
@@ -57,109 +78,513 @@ def product_update(request):
 @permission_required('product.delete_product', raise_exception=True)
 def product_delete(request, id):
     product = Product.objects.filter(id=id).first()
-    cache_keys = [f'product_{product.id}', 'product_list']
     if product is None:
         return Response({'error': 'Product does not exist'}, status=400)
+    # xóa product sẽ xóa luôn các dòng cart (CASCADE), lấy danh sách user trước khi xóa
+    user_ids = cart_users([product.id])
     product.delete()
-    cache.delete_many(cache_keys)
+    cart_totals_changed(user_ids)
     return Response({'message': 'Product deleted successfully'}, status=200)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def product_get_by_id(request, id):
-    product = cache.get(f'product_{id}')
-    if product is None:
+    def load():
         product = Product.objects.filter(id=id).first()
-        if product is None:
-            return Response({'error': 'Product does not exist'}, status=400)
-        serialize = ProductSerializer(product)
-        cache.set(f'product_{id}', serialize.data, timeout=60*60)
-        return Response(serialize.data, status=200)
+        return None if product is None else ProductSerializer(product).data
+
+    product = read_through(f'product_{id}', load, timeout=60*60)
+    if product is None:
+        return Response({'error': 'Product does not exist'}, status=400)
+    # ETag/Last-Modified lấy từ updated_at trong cache, không render lại body khi client đã có bản mới nhất
+    updated_at = parse_datetime(product['updated_at']) if product.get('updated_at') else None
+    etag = make_etag('product', id, product.get('updated_at'))
+    response = not_modified(request, etag, updated_at)
+    if response is not None:
+        return response
+    return set_validators(Response(product, status=200), etag, updated_at)
+
+PRODUCT_BATCH_MAX_IDS = 500
+
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('ids', openapi.IN_QUERY, description="Comma separated product ids", type=openapi.TYPE_STRING, required=True),
+])
+@swagger_auto_schema(method='post', request_body=ProductBatchDto)
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+def product_get_batch(request):
+    if request.method == 'POST':
+        serialize = ProductBatchDto(data=request.data)
+        if not serialize.is_valid():
+            return Response(serialize.errors, status=400)
+        ids = serialize.validated_data['ids']
     else:
-        serialize = ProductSerializer(product)
-        return Response(serialize.data, status=200)
+        try:
+            ids = [int(i) for i in request.GET.get('ids', '').split(',') if i.strip()]
+        except ValueError:
+            return Response({'error': 'Invalid ids'}, status=400)
+        if not ids:
+            return Response({'error': 'ids is required'}, status=400)
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > PRODUCT_BATCH_MAX_IDS:
+        return Response({'error': f'At most {PRODUCT_BATCH_MAX_IDS} ids per request'}, status=400)
+
+    def load(keys):
+        # các key thiếu trong cache: một câu IN cho tất cả
+        products = Product.objects.filter(id__in=[int(key.split('_')[1]) for key in keys])
+        return {f'product_{product.id}': ProductSerializer(product).data for product in products}
+
+    # cùng key product_{id} với product_get_by_id: một lần get_many + tối đa một query
+    found = read_through_many([f'product_{id}' for id in ids], load, timeout=60*60)
+    result = [found[f'product_{id}'] for id in ids if f'product_{id}' in found]
+    not_found = [id for id in ids if f'product_{id}' not in found]
+    return Response({'result': result, 'not_found': not_found}, status=200)
+
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('output', openapi.IN_QUERY, description="ndjson (default) or csv", type=openapi.TYPE_STRING),
+    openapi.Parameter('updated_since', openapi.IN_QUERY, description="ISO datetime, only products updated at or after it", type=openapi.TYPE_STRING),
+], operation_description='Stream the whole product table as NDJSON or CSV')
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def product_export(request):
+    # tham số output thay cho format vì DRF dùng ?format= để chọn renderer
+    export_format = request.GET.get('output', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return Response({'error': f'output must be one of {list(EXPORT_FORMATS)}'}, status=400)
+    updated_since = None
+    if request.GET.get('updated_since'):
+        updated_since = parse_datetime(request.GET['updated_since'])
+        if updated_since is None:
+            return Response({'error': 'Invalid updated_since'}, status=400)
+        if timezone.is_naive(updated_since):
+            updated_since = timezone.make_aware(updated_since)
+
+    content_type, filename = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(iter_export(export_format, updated_since), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+PRODUCT_SORT_FIELDS = ['id', '-id', 'price', '-price', 'name', '-name']
 
 @swagger_auto_schema(method='get', manual_parameters=[
     openapi.Parameter('page_size', openapi.IN_QUERY, description="Page size", type=openapi.TYPE_INTEGER),
-    openapi.Parameter('page_number', openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER)
+    openapi.Parameter('cursor', openapi.IN_QUERY, description="next_cursor from the previous page", type=openapi.TYPE_STRING),
+    openapi.Parameter('sort', openapi.IN_QUERY, description="id, price, name (prefix - for descending)", type=openapi.TYPE_STRING),
+    openapi.Parameter('include_total', openapi.IN_QUERY, description="Return approximate total", type=openapi.TYPE_BOOLEAN),
 ])
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def product_get_all(request):
-    page_size = int(request.GET.get('page_size', 10))
-    page_number = int(request.GET.get('page_number', 1))
-    prods = cache.get('product_list')
-    if prods is None:
-        products = Product.objects.all()
-        paginator = Paginator(products, page_size)
-        result = paginator.page(page_number) if paginator.num_pages >= page_number else []
-        serialize = ProductSerializer(result, many=True, context=({'request': request}))
-        response = {
-            'page': page_number,
-            'page_size': page_size,
-            'result': serialize.data,
+    sort = request.GET.get('sort', 'id')
+    if sort not in PRODUCT_SORT_FIELDS:
+        return Response({'error': f'sort must be one of {PRODUCT_SORT_FIELDS}'}, status=400)
+    try:
+        page_size = get_page_size(request)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=400)
+    cursor = request.GET.get('cursor')
+
+    # ETag tính từ version của danh sách và tham số, trả 304 trước khi đọc cache hay query DB
+    version = list_version()
+    include_total = request.GET.get('include_total') in ('1', 'true', 'True')
+    etag = None if include_total else make_etag('products', version, page_size, sort, cursor)
+    if etag is not None:
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+    def load():
+        products, next_cursor = cursor_paginate(
+            Product.objects.all(), cursor=cursor, page_size=page_size, sort=sort
+        )
+        serialize = ProductSerializer(products, many=True, context=({'request': request}))
+        return {'next_cursor': next_cursor, 'result': list(serialize.data)}
+
+    # mỗi trang một key cache, gắn với version của danh sách sản phẩm
+    try:
+        page = get_list_page(load, version=version, page_size=page_size, sort=sort, cursor=cursor)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=400)
+
+    response = {
+        'page_size': page_size,
+        'next_cursor': page['next_cursor'],
+        'result': page['result'],
+    }
+    if include_total:
+        response['total'] = approximate_count(Product.objects.all())
+    return set_validators(Response(response, status=200), etag)
+
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('q', openapi.IN_QUERY, description="Search text (prefix and token match on name, description)", type=openapi.TYPE_STRING, required=True),
+    openapi.Parameter('min_price', openapi.IN_QUERY, type=openapi.TYPE_NUMBER),
+    openapi.Parameter('max_price', openapi.IN_QUERY, type=openapi.TYPE_NUMBER),
+    openapi.Parameter('in_stock', openapi.IN_QUERY, description="Only products with stock > 0", type=openapi.TYPE_BOOLEAN),
+    openapi.Parameter('page_size', openapi.IN_QUERY, description="Page size", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('cursor', openapi.IN_QUERY, description="next_cursor from the previous page", type=openapi.TYPE_STRING),
+])
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def product_search(request):
+    params = ProductSearchDto(data=request.GET)
+    if not params.is_valid():
+        return Response(params.errors, status=400)
+    data = params.validated_data
+    try:
+        page_size = get_page_size(request, max_size=100)
+        after = None
+        if data.get('cursor'):
+            score, last_id = decode_cursor(data['cursor'], 'search')
+            # cursor do client gửi lên: score phải là số, id phải là số nguyên
+            if type(score) not in (int, float) or type(last_id) is not int:
+                raise InvalidCursor('Invalid cursor')
+            after = (-score, last_id)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=400)
+
+    hits = product_index.search(
+        data['q'], page_size + 1,
+        min_price=data.get('min_price'), max_price=data.get('max_price'),
+        in_stock=data.get('in_stock', False), after=after,
+    )
+    next_cursor = None
+    if len(hits) > page_size:
+        hits = hits[:page_size]
+        next_cursor = encode_cursor('search', [hits[-1][1], hits[-1][0]])
+
+    products = Product.objects.in_bulk([id for id, _ in hits])
+    result = []
+    for id, score in hits:
+        if id in products:
+            item = ProductSerializer(products[id]).data
+            item['score'] = score
+            result.append(item)
+    return Response({
+        'page_size': page_size,
+        'next_cursor': next_cursor,
+        'result': result,
+    }, status=200)
+
+BULK_UPDATE_FIELDS = ['name', 'description', 'price', 'stock']
+
+bulk_parameters = [
+    openapi.Parameter('partial', openapi.IN_QUERY, description="Write valid items and report errors for the rest", type=openapi.TYPE_BOOLEAN),
+    openapi.Parameter('batch_size', openapi.IN_QUERY, description="Rows per INSERT/UPDATE statement", type=openapi.TYPE_INTEGER),
+]
+
+def bulk_options(request):
+    partial = request.GET.get('partial') in ('1', 'true', 'True')
+    try:
+        batch_size = int(request.GET.get('batch_size', settings.PRODUCT_BULK_BATCH_SIZE))
+    except ValueError:
+        raise ValidationError({'error': 'Invalid batch_size'})
+    return partial, max(1, min(batch_size, 5000))
+
+def validate_items(items, serializer):
+    # dùng lại một serializer cho cả danh sách, gom lỗi theo vị trí từng item
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, serializer.run_validation(item)))
+        except ValidationError as e:
+            errors.append({'index': index, 'errors': e.detail})
+    return valid, errors
+
+def check_bulk_payload(items):
+    if not isinstance(items, list):
+        return Response({'error': 'Request body must be a list of products'}, status=400)
+    if len(items) > settings.PRODUCT_BULK_MAX_ITEMS:
+        return Response({'error': f'At most {settings.PRODUCT_BULK_MAX_ITEMS} products per request'}, status=400)
+    return None
+
+@swagger_auto_schema(method='post', request_body=ProductCreateDto(many=True), manual_parameters=bulk_parameters)
+@api_view(['POST'])
+@parser_classes([JSONParser, NDJSONParser])
+@permission_classes([IsAuthenticated])
+@permission_required('product.add_product', raise_exception=True)
+def product_bulk_create(request):
+    error = check_bulk_payload(request.data)
+    if error is not None:
+        return error
+    partial, batch_size = bulk_options(request)
+    valid, errors = validate_items(request.data, ProductCreateDto())
+    if errors and not partial:
+        return Response({'created': 0, 'errors': errors}, status=400)
+
+    # bulk_create không gửi signal và MySQL không trả về id, index tìm kiếm nạp lại các id mới
+    last_id = Product.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    with transaction.atomic():
+        Product.objects.bulk_create([Product(**data) for _, data in valid], batch_size=batch_size)
+    if valid:
+        bump_list_version()
+        publish_changes(since=last_id)
+    return Response({'created': len(valid), 'errors': errors}, status=201 if valid else 400)
+
+@swagger_auto_schema(method='put', request_body=ProductUpdateDto(many=True), manual_parameters=bulk_parameters)
+@api_view(['PUT'])
+@parser_classes([JSONParser, NDJSONParser])
+@permission_classes([IsAuthenticated])
+@permission_required('product.change_product', raise_exception=True)
+def product_bulk_update(request):
+    error = check_bulk_payload(request.data)
+    if error is not None:
+        return error
+    partial, batch_size = bulk_options(request)
+    valid, errors = validate_items(request.data, ProductUpdateDto())
+
+    updated = {}
+    price_changed = set()
+    # chỉ ghi các cột có trong request, không ghi đè stock đang bị reserve/release thay đổi
+    fields = [field for field in BULK_UPDATE_FIELDS if any(field in data for _, data in valid)]
+    # một câu IN lấy toàn bộ sản phẩm cần cập nhật
+    products = Product.objects.in_bulk([data['id'] for _, data in valid])
+    for index, data in valid:
+        product = products.get(data['id'])
+        if product is None:
+            errors.append({'index': index, 'errors': {'id': ['Product does not exist']}})
+            continue
+        if 'price' in data and data['price'] != product.price:
+            price_changed.add(product.id)
+        for field in BULK_UPDATE_FIELDS:
+            if field in data:
+                setattr(product, field, data[field])
+        updated[product.id] = product
+    errors.sort(key=lambda e: e['index'])
+    if errors and not partial:
+        return Response({'updated': 0, 'errors': errors}, status=400)
+
+    # bulk_update không tự cập nhật auto_now
+    now = timezone.now()
+    for product in updated.values():
+        product.updated_at = now
+    with transaction.atomic():
+        Product.objects.bulk_update(list(updated.values()), fields + ['updated_at'], batch_size=batch_size)
+    # bulk_update không gửi signal post_save
+    invalidate_products(updated)
+    if price_changed:
+        invalidate_cart_totals(price_changed)
+    return Response({'updated': len(updated), 'errors': errors}, status=200 if updated else 400)
+
+@swagger_auto_schema(method='delete', request_body=BulkDeleteProductDto, manual_parameters=bulk_parameters[1:])
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+@permission_required('product.delete_product', raise_exception=True)
+def product_bulk_delete(request):
+    serialize = BulkDeleteProductDto(data=request.data)
+    if not serialize.is_valid():
+        return Response(serialize.errors, status=400)
+    ids = list(set(serialize.validated_data['ids']))
+    if len(ids) > settings.PRODUCT_BULK_MAX_ITEMS:
+        return Response({'error': f'At most {settings.PRODUCT_BULK_MAX_ITEMS} products per request'}, status=400)
+    _, batch_size = bulk_options(request)
+    user_ids = cart_users(ids)
+
+    deleted = 0
+    with transaction.atomic():
+        for i in range(0, len(ids), batch_size):
+            _, per_model = Product.objects.filter(id__in=ids[i:i + batch_size]).delete()
+            deleted += per_model.get(Product._meta.label, 0)
+    if deleted:
+        # cache và index tìm kiếm được xóa bởi signal post_delete của từng dòng
+        cart_totals_changed(user_ids)
+    return Response({'deleted': deleted}, status=200)
+
+def cart_errors(errors):
+    # giữ nguyên thông báo lỗi cũ của API cart
+    if 'user' in errors:
+        return Response({'error': 'User does not exist'}, status=400)
+    if 'product' in errors:
+        return Response({'error': 'Product does not exist'}, status=400)
+    return Response(errors, status=400)
+
+CART_PRODUCT_FIELDS = ('id', 'name', 'price', 'stock')
+
+def cart_detail(user_id):
+    # giỏ hàng kèm thông tin sản phẩm và thành tiền từng dòng trong một câu query
+    if use_redis_cart():
+        lines = cart_store.lines(user_id)
+        products = {
+            product['id']: product
+            for product in Product.objects.filter(id__in=[line['product'] for line in lines]).values(*CART_PRODUCT_FIELDS)
         }
-        cache.set('product_list', list(products), timeout=60*60)
-        return Response(response, status=200)
+        rows = [(line['id'], line['quantity'], products.get(line['product'])) for line in lines]
     else:
-        print('get from cache done...')
-        products = prods
-        paginator = Paginator(products, page_size)
-        result = paginator.page(page_number) if paginator.num_pages >= page_number else []
-        serialize = ProductSerializer(result, many=True, context=({'request': request}))
-        response = {
-            'page': page_number,
-            'page_size': page_size,
-            'result': serialize.data,
-        }
-        return Response(response, status=200)
+        rows = [
+            (row['id'], row['quantity'], {field: row[f'product__{field}'] for field in CART_PRODUCT_FIELDS})
+            for row in Cart.objects.filter(user_id=user_id).order_by('id').values(
+                'id', 'quantity', *[f'product__{field}' for field in CART_PRODUCT_FIELDS]
+            )
+        ]
+    items = []
+    total_amount = Decimal('0')
+    for id, quantity, product in rows:
+        if product is None:
+            continue
+        subtotal = product['price'] * quantity
+        total_amount += subtotal
+        items.append({'id': id, 'quantity': quantity, 'subtotal': subtotal, 'product': product})
+    return {'user': user_id, 'items': items, 'total_amount': total_amount}
+
+def product_price(product_id):
+    return Product.objects.filter(id=product_id).values_list('price', flat=True).first()
 
 class CartViewSet(viewsets.ModelViewSet):
     queryset = Cart.objects.all()
     serializer_class = CartSerializer
 
+    # settings.CART_BACKEND = 'redis': giỏ hàng đọc/ghi trên Redis hash,
+    # task product.tasks.flush_redis_carts ghi dồn xuống bảng cart theo lô
+    def list(self, request, *args, **kwargs):
+        if not use_redis_cart():
+            return super().list(request, *args, **kwargs)
+        # Redis chỉ lưu giỏ hàng theo từng user nên trả về giỏ hàng của user đang đăng nhập
+        if not request.user.is_authenticated:
+            return Response([], status=200)
+        return Response(cart_store.lines(request.user.id), status=200)
+
+    @action(detail=False, methods=['get'], url_path='mine', permission_classes=[IsAuthenticated])
+    def mine(self, request):
+        return Response(cart_detail(request.user.id), status=200)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not use_redis_cart():
+            return super().retrieve(request, *args, **kwargs)
+        line = cart_store.get(kwargs.get('pk'))
+        if line is None:
+            return Response({'error': 'Cart does not exist'}, status=404)
+        return Response(line, status=200)
+
     def create(self, request, *args, **kwargs):
-        if not User.objects.filter(id=request.data['user']):
-            return Response({'error': 'User does not exist'}, status=400)
-        if not Product.objects.filter(id=request.data['product']):
-            return Response({'error': 'Product does not exist'}, status=400)
+        if use_redis_cart():
+            return self.redis_create(request)
         if int(request.data['quantity']) <= 0:
             return Response ({'error': 'Quantity cannot be negative'}, status=400)
-        elif int(request.data['quantity']) > Product.objects.get(id=request.data['product']).stock:
-            return Response({'error': 'Quantity cannot be greater than stock'}, status=400)
 
         serialize = CartSerializer(data=request.data, context={'request': request})
-        if serialize.is_valid():
-            serialize.save()
-            return Response(serialize.data, status=201)
-        return Response(serialize.errors, status=400)
+        if not serialize.is_valid():
+            return cart_errors(serialize.errors)
+        try:
+            # giữ hàng bằng UPDATE có điều kiện, lỗi thì rollback cả dòng cart
+            with transaction.atomic():
+                cart = serialize.save()
+                reserve(cart.product_id, cart.user_id, cart.quantity, cart_id=cart.id)
+        except ReservationError as e:
+            return Response({'error': str(e)}, status=400)
+        cart_totals_changed([cart.user_id])
+        return Response(serialize.data, status=201)
 
     def update(self, request, *args, **kwargs):
-        if not Cart.objects.filter(id=kwargs.get('pk')).exists():
+        if use_redis_cart():
+            return self.redis_update(request, kwargs.get('pk'))
+        cart = Cart.objects.filter(id=kwargs.get('pk')).first()
+        if cart is None:
             return Response({'error': 'Cart does not exist'}, status=400)
-        if not User.objects.filter(id=request.data['user']):
-            return Response({'error': 'User does not exist'}, status=400)
-        if not Product.objects.filter(id=request.data['product']):
-            return Response({'error': 'Product does not exist'}, status=400)
         if int(request.data['quantity']) <= 0:
             return Response({'error': 'Quantity cannot be negative'}, status=400)
-        elif int(request.data['quantity']) > Product.objects.get(id=request.data['product']).stock:
-            return Response({'error': 'Quantity cannot be greater than stock'}, status=400)
 
-        cart = Cart.objects.get(id=kwargs.get('pk'))
+        old_user_id = cart.user_id
         serialize = CartSerializer(cart, data=request.data, partial=True)
-        if serialize.is_valid():
-            serialize.save()
-            return Response(serialize.data, status=201)
-        return Response(serialize.errors, status=400)
+        if not serialize.is_valid():
+            return cart_errors(serialize.errors)
+        try:
+            with transaction.atomic():
+                release_for_cart(cart.id)
+                cart = serialize.save()
+                reserve(cart.product_id, cart.user_id, cart.quantity, cart_id=cart.id)
+        except ReservationError as e:
+            return Response({'error': str(e)}, status=400)
+        cart_totals_changed([old_user_id, cart.user_id])
+        return Response(serialize.data, status=201)
+
+    def destroy(self, request, *args, **kwargs):
+        if use_redis_cart():
+            return self.redis_destroy(kwargs.get('pk'))
+        cart = Cart.objects.filter(id=kwargs.get('pk')).first()
+        if cart is None:
+            return Response({'error': 'Cart does not exist'}, status=404)
+        user_id = cart.user_id
+        with transaction.atomic():
+            release_for_cart(cart.id)
+            cart.delete()
+        cart_totals_changed([user_id])
+        return Response(status=204)
+
+    def redis_add(self, user_id, product_id, quantity, replace=False):
+        # MySQL chỉ còn câu giữ hàng, dòng cart được ghi vào Redis và flush sau
+        price = product_price(product_id)
+        if price is None:
+            return None, Response({'error': 'Product does not exist'}, status=400)
+        line_id = cart_store.line_id(user_id, product_id)
+        try:
+            with transaction.atomic():
+                if replace:
+                    release_for_cart(line_id)
+                reserve(product_id, user_id, quantity, cart_id=line_id)
+        except ReservationError as e:
+            return None, Response({'error': str(e)}, status=400)
+        except IntegrityError:
+            return None, Response({'error': 'User does not exist'}, status=400)
+        if replace:
+            line = cart_store.set_quantity(user_id, product_id, quantity)
+        else:
+            line = cart_store.add(user_id, product_id, quantity)
+        cart_totals_changed([user_id])
+        return line, None
+
+    def redis_create(self, request):
+        try:
+            user_id, product_id = int(request.data['user']), int(request.data['product'])
+            quantity = int(request.data['quantity'])
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'user, product and quantity are required'}, status=400)
+        if quantity <= 0:
+            return Response({'error': 'Quantity cannot be negative'}, status=400)
+        line, error = self.redis_add(user_id, product_id, quantity)
+        if error is not None:
+            return error
+        return Response(line, status=201)
+
+    def redis_update(self, request, pk):
+        line = cart_store.get(pk)
+        if line is None:
+            return Response({'error': 'Cart does not exist'}, status=400)
+        try:
+            user_id = int(request.data.get('user', line['user']))
+            product_id = int(request.data.get('product', line['product']))
+            quantity = int(request.data.get('quantity', line['quantity']))
+        except (TypeError, ValueError):
+            return Response({'error': 'user, product and quantity must be integers'}, status=400)
+        if quantity <= 0:
+            return Response({'error': 'Quantity cannot be negative'}, status=400)
+
+        if (user_id, product_id) == (line['user'], line['product']):
+            new_line, error = self.redis_add(user_id, product_id, quantity, replace=True)
+            if error is not None:
+                return error
+            return Response(new_line, status=201)
+
+        # đổi user/product: dòng cart thuộc key khác trong Redis, bỏ dòng cũ rồi thêm dòng mới
+        new_line, error = self.redis_add(user_id, product_id, quantity)
+        if error is not None:
+            return error
+        self.redis_destroy(pk)
+        return Response(new_line, status=201)
+
+    def redis_destroy(self, pk):
+        line = cart_store.get(pk)
+        if line is None:
+            return Response({'error': 'Cart does not exist'}, status=404)
+        release_for_cart(line['id'])
+        cart_store.remove(line['user'], line['product'], line['id'])
+        cart_totals_changed([line['user']])
+        return Response(status=204)
 
 @api_view(['GET'])
 def get_total_price(request, id):
-    if not User.objects.filter(id=id).exists():
-        return Response({'error': 'User does not exist'}, status=400)
-
-    total_amount = 0
-    cart = Cart.objects.filter(user=id)
-    for item in cart:
-        total_amount += item.product.price * item.quantity
+    # O(1) khi đã có trong cache, nếu chưa có thì một câu aggregate
+    total_amount = get_cart_total(id)
+    if total_amount is None:
+        if not User.objects.filter(id=id).exists():
+            return Response({'error': 'User does not exist'}, status=400)
+        total_amount = refresh_cart_total(id)
     return Response({'user': id, 'total_amount': total_amount}, status=200)
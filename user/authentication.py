@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .models import User
+
+AUTH_USER_KEY = 'auth_user_{}'
+
+
+def auth_user_timeout():
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+
+
+def invalidate_auth_user(user_id):
+    cache.delete(AUTH_USER_KEY.format(user_id))
+
+
+def auth_user_fields():
+    # password chỉ cần khi kiểm tra token bị thu hồi, không thì không lưu hash mật khẩu vào cache
+    return [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname != 'password' or api_settings.CHECK_REVOKE_TOKEN
+    ]
+
+
+def load_auth_user(user_id):
+    # cache giá trị các cột thay vì object User: mỗi request dựng một instance riêng,
+    # không dùng chung object (và _perm_cache) giữa các request
+    key = AUTH_USER_KEY.format(user_id)
+    fields = auth_user_fields()
+    using = router.db_for_read(User)
+    values = cache.get(key)
+    if values is None:
+        values = User.objects.using(using).filter(id=user_id).values_list(*fields).first()
+        if values is None:
+            return None
+        cache.set(key, values, timeout=auth_user_timeout())
+    # các cột không có trong cache (password) là deferred, chỉ query khi được truy cập
+    return User.from_db(using, fields, values)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    # Giống JWTAuthentication nhưng user được đọc từ cache (TTL ngắn),
+    # cache bị xóa khi user được lưu hoặc bị xóa (user/signals.py)
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user = load_auth_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
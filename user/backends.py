@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+from .effective_permissions import permission_names
+from .models import User
+
+PERMISSION_KEY = 'user_perms_{}'
+
+
+def permission_cache_timeout():
+    return getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 60 * 60)
+
+
+def invalidate_permissions(user_ids):
+    keys = [PERMISSION_KEY.format(user_id) for user_id in set(user_ids)]
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_all_permissions(batch_size=1000):
+    user_ids = list(User.objects.values_list('id', flat=True))
+    for i in range(0, len(user_ids), batch_size):
+        invalidate_permissions(user_ids[i:i + batch_size])
+
+
+def invalidate_permissions_on_commit(user_ids):
+    # xóa ngay và xóa lại sau commit, tránh request khác đọc bản cũ từ DB rồi ghi lại vào cache
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    invalidate_permissions(user_ids)
+    transaction.on_commit(lambda: invalidate_permissions(user_ids))
+
+
+def group_member_ids(group_ids):
+    return list(User.groups.through.objects.filter(group_id__in=group_ids).values_list('user_id', flat=True).distinct())
+
+
+class CachedPermissionBackend(ModelBackend):
+    # Tập quyền hiệu lực (quyền riêng + quyền của group) của mỗi user lưu trong cache,
+    # kiểm tra quyền chỉ cần một lần đọc cache thay vì join user/group/permission.
+    # Cache bị xóa bằng signal m2m_changed/pre_delete trong user/signals.py.
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            key = PERMISSION_KEY.format(user_obj.pk)
+            perms = cache.get(key)
+            if perms is None:
+                if user_obj.is_superuser:
+                    perms = super().get_all_permissions(user_obj)
+                else:
+                    # một câu query trên bảng user_effective_permission thay vì join user/group/permission
+                    perms = permission_names(user_obj.pk)
+                cache.set(key, perms, timeout=permission_cache_timeout())
+            user_obj._perm_cache = set(perms)
+        return user_obj._perm_cache
@@ -0,0 +1,73 @@
+from django.contrib.auth.models import Group
+from . import effective_permissions
+from .backends import group_member_ids, invalidate_permissions_on_commit
+from .models import User
+
+BATCH_SIZE = 1000
+OWNER_CHUNK = 500
+
+USER_PERMISSIONS = (User.user_permissions.through, 'user_id', 'permission_id')
+GROUP_PERMISSIONS = (Group.permissions.through, 'group_id', 'permission_id')
+USER_GROUPS = (User.groups.through, 'user_id', 'group_id')
+
+
+# bulk_create/delete trên bảng trung gian không gửi m2m_changed, tự đồng bộ user_effective_permission
+SYNC = {
+    USER_PERMISSIONS[0]: (effective_permissions.grant_direct, effective_permissions.revoke_direct),
+    GROUP_PERMISSIONS[0]: (effective_permissions.grant_group, effective_permissions.revoke_group),
+    USER_GROUPS[0]: (effective_permissions.join_groups, effective_permissions.leave_groups),
+}
+
+
+def missing_ids(model, ids):
+    # một câu IN cho toàn bộ id
+    found = set(model.objects.filter(id__in=ids).values_list('id', flat=True))
+    return sorted(set(ids) - found)
+
+
+def _chunks(ids):
+    ids = sorted(set(ids))
+    for i in range(0, len(ids), OWNER_CHUNK):
+        yield ids[i:i + OWNER_CHUNK]
+
+
+def assign(relation, owner_ids, target_ids):
+    # Chỉ insert các cặp (owner, target) chưa có: đọc các dòng hiện có theo lô owner,
+    # lấy hiệu tập hợp rồi bulk_create vào bảng trung gian.
+    # ignore_conflicts: request khác vừa thêm cùng cặp thì bỏ qua dòng đó thay vì IntegrityError.
+    # bulk_create không gửi m2m_changed nên nơi gọi phải tự xóa cache quyền.
+    through, owner_field, target_field = relation
+    target_ids = sorted(set(target_ids))
+    created = 0
+    for owners in _chunks(owner_ids):
+        existing = set(through.objects.filter(
+            **{f'{owner_field}__in': owners, f'{target_field}__in': target_ids}
+        ).values_list(owner_field, target_field))
+        rows = [
+            through(**{owner_field: owner, target_field: target})
+            for owner in owners for target in target_ids if (owner, target) not in existing
+        ]
+        through.objects.bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        created += len(rows)
+    if owner_ids and target_ids:
+        SYNC[through][0](owner_ids, target_ids)
+    return created
+
+
+def revoke(relation, owner_ids, target_ids):
+    through, owner_field, target_field = relation
+    target_ids = sorted(set(target_ids))
+    deleted = 0
+    for owners in _chunks(owner_ids):
+        count, _ = through.objects.filter(**{f'{owner_field}__in': owners, f'{target_field}__in': target_ids}).delete()
+        deleted += count
+    if owner_ids and target_ids:
+        SYNC[through][1](owner_ids, target_ids)
+    return deleted
+
+
+def invalidate(user_ids=(), group_ids=()):
+    user_ids = set(user_ids)
+    if group_ids:
+        user_ids.update(group_member_ids(group_ids))
+    invalidate_permissions_on_commit(user_ids)
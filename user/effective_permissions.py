@@ -0,0 +1,94 @@
+from django.contrib.auth.models import Group
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from .models import EffectivePermission, User
+
+BATCH_SIZE = 1000
+USER_CHUNK = 500
+
+
+def _insert(rows):
+    # rows: tập (user_id, permission_id, group_id), chỉ insert các dòng chưa có
+    rows = sorted(rows, key=lambda row: (row[0], row[1], row[2] or 0))
+    for i in range(0, len(rows), USER_CHUNK * 10):
+        chunk = rows[i:i + USER_CHUNK * 10]
+        existing = set(EffectivePermission.objects.filter(
+            user_id__in={row[0] for row in chunk}, permission_id__in={row[1] for row in chunk}
+        ).values_list('user_id', 'permission_id', 'group_id'))
+        EffectivePermission.objects.bulk_create([
+            EffectivePermission(user_id=user_id, permission_id=permission_id, group_id=group_id)
+            for user_id, permission_id, group_id in chunk if (user_id, permission_id, group_id) not in existing
+        ], batch_size=BATCH_SIZE)
+
+
+def grant_direct(user_ids, permission_ids):
+    _insert({(user_id, permission_id, None) for user_id in user_ids for permission_id in permission_ids})
+
+
+def revoke_direct(user_ids=None, permission_ids=None):
+    queryset = EffectivePermission.objects.filter(group__isnull=True)
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    if permission_ids is not None:
+        queryset = queryset.filter(permission_id__in=permission_ids)
+    queryset.delete()
+
+
+def join_groups(user_ids, group_ids):
+    group_permissions = list(Group.permissions.through.objects.filter(group_id__in=group_ids).values_list('group_id', 'permission_id'))
+    _insert({(user_id, permission_id, group_id) for user_id in user_ids for group_id, permission_id in group_permissions})
+
+
+def leave_groups(user_ids=None, group_ids=None):
+    queryset = EffectivePermission.objects.filter(group__isnull=False)
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    if group_ids is not None:
+        queryset = queryset.filter(group_id__in=group_ids)
+    queryset.delete()
+
+
+def grant_group(group_ids, permission_ids):
+    members = list(User.groups.through.objects.filter(group_id__in=group_ids).values_list('user_id', 'group_id'))
+    _insert({(user_id, permission_id, group_id) for user_id, group_id in members for permission_id in permission_ids})
+
+
+def revoke_group(group_ids=None, permission_ids=None):
+    queryset = EffectivePermission.objects.filter(group__isnull=False)
+    if group_ids is not None:
+        queryset = queryset.filter(group_id__in=group_ids)
+    if permission_ids is not None:
+        queryset = queryset.filter(permission_id__in=permission_ids)
+    queryset.delete()
+
+
+def rebuild(using=DEFAULT_DB_ALIAS):
+    # dựng lại toàn bộ bảng bằng INSERT ... SELECT, không đưa dữ liệu lên Python
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(EffectivePermission._meta.db_table)
+    user_permissions = quote(User.user_permissions.through._meta.db_table)
+    user_groups = quote(User.groups.through._meta.db_table)
+    group_permissions = quote(Group.permissions.through._meta.db_table)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, permission_id, group_id) '
+            f'SELECT user_id, permission_id, NULL FROM {user_permissions}'
+        )
+        direct = cursor.rowcount
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, permission_id, group_id) '
+            f'SELECT ug.user_id, gp.permission_id, ug.group_id FROM {user_groups} ug '
+            f'JOIN {group_permissions} gp ON gp.group_id = ug.group_id'
+        )
+        return {'direct': direct, 'group': cursor.rowcount}
+
+
+def permission_names(user_id):
+    # một câu query trên index (user_id, permission_id)
+    return {
+        f'{app_label}.{codename}'
+        for app_label, codename in EffectivePermission.objects.filter(user_id=user_id).values_list(
+            'permission__content_type__app_label', 'permission__codename'
+        )
+    }
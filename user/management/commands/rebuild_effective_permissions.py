@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from user.backends import invalidate_all_permissions
+from user.effective_permissions import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the user_effective_permission table from user permissions, groups and group permissions'
+
+    def handle(self, *args, **options):
+        result = rebuild()
+        # bỏ tập quyền đã cache để lần kiểm tra sau đọc lại từ bảng mới
+        invalidate_all_permissions()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt effective permissions: {result["direct"]} direct, {result["group"]} from groups'
+        ))
@@ -1,5 +1,5 @@
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
-from django.contrib.auth.models import PermissionsMixin
+from django.contrib.auth.models import PermissionsMixin, Permission, Group
 from django.db import models
 from django.contrib.auth.hashers import make_password
 
@@ -30,10 +30,35 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
     password = models.CharField(max_length=128)
+    updated_at = models.DateTimeField(auto_now=True)
 
     USERNAME_FIELD = 'username'
 
     objects = CustomUserManager()
 
+    class Meta:
+        # danh sách superuser (view_users_by_permission_id) là range scan trên index
+        indexes = [
+            models.Index(fields=['is_superuser', 'id']),
+        ]
+
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+class EffectivePermission(models.Model):
+    # Quyền hiệu lực của user, đồng bộ từ user_permissions, groups và group.permissions (user/effective_permissions.py).
+    # group null: quyền gán trực tiếp, ngược lại: quyền có được qua group đó
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    permission = models.ForeignKey(Permission, on_delete=models.CASCADE)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, blank=True, null=True)
+
+    class Meta:
+        db_table = 'user_effective_permission'
+        indexes = [
+            models.Index(fields=['user', 'permission']),
+            models.Index(fields=['permission', 'user']),
+        ]
+
+    @property
+    def source(self):
+        return 'direct' if self.group_id is None else 'group'
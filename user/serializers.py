@@ -52,6 +52,20 @@ class UpdateGroupDto(serializers.ModelSerializer):
     name = serializers.CharField(max_length=150)
     permission_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True)
 
+class BulkPermissionDto(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    group_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    permission_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+    def validate(self, data):
+        if not data['user_ids'] and not data['group_ids']:
+            raise serializers.ValidationError('user_ids or group_ids is required')
+        return data
+
+class BulkGroupMemberDto(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    group_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
 class SendMailDto(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -0,0 +1,141 @@
+import logging
+
+from django.contrib.auth.models import Group, Permission
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed, post_migrate
+from django.dispatch import receiver
+from .authentication import invalidate_auth_user
+from .backends import invalidate_all_permissions, invalidate_permissions_on_commit, group_member_ids
+from . import effective_permissions
+from .models import User, EffectivePermission
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # xóa ngay và xóa lại sau commit, tránh request khác đọc bản cũ từ DB rồi ghi lại vào cache
+    user_id = instance.id
+    invalidate_auth_user(user_id)
+    transaction.on_commit(lambda: invalidate_auth_user(user_id))
+    # is_active / is_superuser thay đổi thì tập quyền cũng thay đổi
+    invalidate_permissions_on_commit([user_id])
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def user_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_permissions_on_commit([instance.pk])
+    elif sender is User.groups.through:
+        # group.user_set.add/remove/clear
+        invalidate_permissions_on_commit(pk_set if action != 'pre_clear' else group_member_ids([instance.pk]))
+    else:
+        # permission.user_set.add/remove/clear
+        if action == 'pre_clear':
+            pk_set = User.user_permissions.through.objects.filter(permission_id=instance.pk).values_list('user_id', flat=True)
+        invalidate_permissions_on_commit(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        group_ids = [instance.pk]
+    elif action == 'pre_clear':
+        group_ids = list(Group.permissions.through.objects.filter(permission_id=instance.pk).values_list('group_id', flat=True))
+    else:
+        group_ids = list(pk_set)
+    invalidate_permissions_on_commit(group_member_ids(group_ids))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # xóa group không gửi m2m_changed cho các dòng bảng trung gian
+    invalidate_permissions_on_commit(group_member_ids([instance.pk]))
+
+
+@receiver(pre_delete, sender=Permission)
+def permission_deleted(sender, instance, **kwargs):
+    user_ids = set(User.user_permissions.through.objects.filter(permission_id=instance.pk).values_list('user_id', flat=True))
+    user_ids.update(group_member_ids(
+        Group.permissions.through.objects.filter(permission_id=instance.pk).values_list('group_id', flat=True)
+    ))
+    invalidate_permissions_on_commit(user_ids)
+
+
+# Đồng bộ bảng user_effective_permission, chạy trong cùng transaction với thay đổi m2m
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def sync_direct_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        if reverse:
+            effective_permissions.grant_direct(pk_set, [instance.pk])
+        else:
+            effective_permissions.grant_direct([instance.pk], pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            effective_permissions.revoke_direct(pk_set, [instance.pk])
+        else:
+            effective_permissions.revoke_direct([instance.pk], pk_set)
+    elif action == 'post_clear':
+        if reverse:
+            effective_permissions.revoke_direct(permission_ids=[instance.pk])
+        else:
+            effective_permissions.revoke_direct(user_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def sync_group_members(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        if reverse:
+            effective_permissions.join_groups(pk_set, [instance.pk])
+        else:
+            effective_permissions.join_groups([instance.pk], pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            effective_permissions.leave_groups(pk_set, [instance.pk])
+        else:
+            effective_permissions.leave_groups([instance.pk], pk_set)
+    elif action == 'post_clear':
+        if reverse:
+            effective_permissions.leave_groups(group_ids=[instance.pk])
+        else:
+            effective_permissions.leave_groups(user_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def sync_group_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        if reverse:
+            effective_permissions.grant_group(pk_set, [instance.pk])
+        else:
+            effective_permissions.grant_group([instance.pk], pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            effective_permissions.revoke_group(pk_set, [instance.pk])
+        else:
+            effective_permissions.revoke_group([instance.pk], pk_set)
+    elif action == 'post_clear':
+        if reverse:
+            effective_permissions.revoke_group(permission_ids=[instance.pk])
+        else:
+            effective_permissions.revoke_group(group_ids=[instance.pk])
+
+
+@receiver(post_migrate)
+def fill_effective_permissions(sender, using, **kwargs):
+    # CachedPermissionBackend chỉ đọc bảng user_effective_permission: dựng lại bảng sau mỗi lần migrate
+    # để bảng mới tạo (hoặc bị lệch) luôn có dữ liệu trước khi phục vụ kiểm tra quyền
+    if sender.name != 'user':
+        return
+    if EffectivePermission._meta.db_table not in connections[using].introspection.table_names():
+        return
+    effective_permissions.rebuild(using=using)
+    try:
+        invalidate_all_permissions()
+    except Exception as e:
+        logger.error(f'invalidate cached permissions after rebuild failed: {e}')
@@ -1,3 +1,107 @@
+from django.contrib.auth.models import Group, Permission
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+from . import bulk, effective_permissions
+from .backends import CachedPermissionBackend
+from .models import User, EffectivePermission
+from .view_permissions import view_permissions_by_id
 
-# Create your tests here.
+
+def effective(user):
+    return set(EffectivePermission.objects.filter(user=user).values_list('permission_id', 'group_id'))
+
+
+class EffectivePermissionSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='member', password='x', is_active=True)
+        self.other = User.objects.create(username='other', password='x', is_active=True)
+        self.group = Group.objects.create(name='staff')
+        self.p1, self.p2, self.p3 = Permission.objects.filter(content_type__app_label='product').order_by('id')[:3]
+
+    def assertMatchesRebuild(self):
+        # bảng được đồng bộ tăng dần phải giống hệt bảng dựng lại từ đầu
+        synced = set(EffectivePermission.objects.values_list('user_id', 'permission_id', 'group_id'))
+        effective_permissions.rebuild()
+        self.assertEqual(synced, set(EffectivePermission.objects.values_list('user_id', 'permission_id', 'group_id')))
+
+    def test_direct_permissions(self):
+        self.user.user_permissions.add(self.p1, self.p2)
+        self.p3.user_set.add(self.user, self.other)
+        self.assertEqual(effective(self.user), {(self.p1.id, None), (self.p2.id, None), (self.p3.id, None)})
+        self.user.user_permissions.remove(self.p1)
+        self.p3.user_set.remove(self.other)
+        self.assertEqual(effective(self.user), {(self.p2.id, None), (self.p3.id, None)})
+        self.assertEqual(effective(self.other), set())
+        self.user.user_permissions.clear()
+        self.assertEqual(effective(self.user), set())
+        self.assertMatchesRebuild()
+
+    def test_group_membership_and_group_permissions(self):
+        self.group.permissions.add(self.p1)
+        self.user.groups.add(self.group)
+        self.group.user_set.add(self.other)
+        self.group.permissions.add(self.p2)
+        self.assertEqual(effective(self.user), {(self.p1.id, self.group.id), (self.p2.id, self.group.id)})
+        self.assertEqual(effective(self.other), effective(self.user))
+
+        self.group.permissions.remove(self.p1)
+        self.group.user_set.remove(self.other)
+        self.assertEqual(effective(self.user), {(self.p2.id, self.group.id)})
+        self.assertEqual(effective(self.other), set())
+        self.assertMatchesRebuild()
+
+        self.group.delete()
+        self.assertEqual(effective(self.user), set())
+
+    def test_direct_and_group_grant_are_separate(self):
+        # bỏ quyền trực tiếp vẫn còn quyền có được qua group
+        self.user.user_permissions.add(self.p1)
+        self.group.permissions.add(self.p1)
+        self.user.groups.add(self.group)
+        self.user.user_permissions.remove(self.p1)
+        self.assertEqual(effective(self.user), {(self.p1.id, self.group.id)})
+        self.assertTrue(CachedPermissionBackend().has_perm(User.objects.get(id=self.user.id), f'product.{self.p1.codename}'))
+        self.user.groups.remove(self.group)
+        self.assertFalse(CachedPermissionBackend().has_perm(User.objects.get(id=self.user.id), f'product.{self.p1.codename}'))
+
+    def test_permission_deleted(self):
+        self.user.user_permissions.add(self.p1)
+        self.group.permissions.add(self.p1)
+        self.user.groups.add(self.group)
+        self.p1.delete()
+        self.assertEqual(effective(self.user), set())
+
+    def test_bulk_assign_and_revoke(self):
+        users = [self.user.id, self.other.id]
+        self.user.groups.add(self.group)
+        self.assertEqual(bulk.assign(bulk.USER_PERMISSIONS, users, [self.p1.id, self.p2.id]), 4)
+        self.assertEqual(bulk.assign(bulk.USER_PERMISSIONS, users, [self.p1.id, self.p2.id]), 0)
+        bulk.assign(bulk.GROUP_PERMISSIONS, [self.group.id], [self.p3.id])
+        bulk.assign(bulk.USER_GROUPS, [self.other.id], [self.group.id])
+        self.assertEqual(effective(self.other), {(self.p1.id, None), (self.p2.id, None), (self.p3.id, self.group.id)})
+        self.assertMatchesRebuild()
+
+        bulk.revoke(bulk.USER_PERMISSIONS, users, [self.p1.id])
+        bulk.revoke(bulk.USER_GROUPS, [self.user.id], [self.group.id])
+        self.assertEqual(effective(self.user), {(self.p2.id, None)})
+        self.assertEqual(effective(self.other), {(self.p2.id, None), (self.p3.id, self.group.id)})
+        self.assertMatchesRebuild()
+
+    def test_view_effective_permissions(self):
+        admin = User.objects.create(username='admin', password='x', is_active=True, is_superuser=True)
+        self.user.user_permissions.add(self.p1)
+        self.group.permissions.add(self.p2)
+        self.user.groups.add(self.group)
+
+        def get(user_id):
+            request = APIRequestFactory().get('/', {'effective': 'true'})
+            force_authenticate(request, admin)
+            return view_permissions_by_id(request, id=user_id)
+
+        response = get(self.user.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {(row['id'], row['source'], row['group_id']) for row in response.data},
+            {(self.p1.id, 'direct', None), (self.p2.id, 'group', self.group.id)},
+        )
+        self.assertEqual(get(self.user.id + 1000).status_code, 400)
@@ -4,30 +4,31 @@ from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth.decorators import permission_required
 from rest_framework.permissions import IsAuthenticated, AllowAny, DjangoModelPermissions
 from rest_framework.response import Response
-from django.core.paginator import Paginator
+from DemoDjango.pagination import cursor_paginate, encode_cursor, get_page_size
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from user.models import User
-from user.serializers import AddPermissionDto, DeletePermissionDto, AddGroupDto, UpdateGroupDto
+from user.models import User, EffectivePermission
+from user.serializers import (AddPermissionDto, DeletePermissionDto, AddGroupDto, UpdateGroupDto, BulkPermissionDto,
+                              BulkGroupMemberDto)
+from user import bulk
 
 
 @swagger_auto_schema(method='get', manual_parameters=[
     openapi.Parameter('page_size', openapi.IN_QUERY, description="Number of items per page", type=openapi.TYPE_INTEGER),
-    openapi.Parameter('page_number', openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('cursor', openapi.IN_QUERY, description="next_cursor from the previous page", type=openapi.TYPE_STRING),
 ])
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @permission_required(['auth.view_permission'], raise_exception=True)
 def view_permissions(request):
     try:
-        permissions = Permission.objects.all()
-        page_size = int(request.query_params.get('page_size', 10))
-        page_number = int(request.query_params.get('page_number', 1))
-        paginator = Paginator(permissions, page_size)
-        permission_page = paginator.get_page(page_number) if paginator.num_pages >= page_number else []
+        page_size = get_page_size(request)
+        permission_page, next_cursor = cursor_paginate(
+            Permission.objects.only('id', 'name', 'codename'), cursor=request.query_params.get('cursor'), page_size=page_size
+        )
         result = {
-            'page': page_number,
             'page_size': page_size,
+            'next_cursor': next_cursor,
             'result': [
                 {
                     'id': permission.id,
@@ -40,11 +41,30 @@ def view_permissions(request):
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('effective', openapi.IN_QUERY, description="Include permissions granted through groups", type=openapi.TYPE_BOOLEAN),
+])
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @permission_required(['auth.view_permission'], raise_exception=True)
 def view_permissions_by_id(request, id):
     try:
+        if not User.objects.filter(id=id).exists():
+            return Response({'error': 'User does not exist'}, status=400)
+        if request.query_params.get('effective') in ('1', 'true', 'True'):
+            # quyền hiệu lực và nguồn gốc (trực tiếp / qua group) từ bảng user_effective_permission
+            rows = EffectivePermission.objects.filter(user_id=id).order_by('permission_id', 'group_id').values(
+                'permission_id', 'permission__name', 'permission__codename', 'group_id'
+            )
+            return Response([
+                {
+                    'id': row['permission_id'],
+                    'name': row['permission__name'],
+                    'codename': row['permission__codename'],
+                    'source': 'direct' if row['group_id'] is None else 'group',
+                    'group_id': row['group_id'],
+                } for row in rows
+            ], status=200)
         user = User.objects.prefetch_related('user_permissions').get(id=id)
         permissions = user.user_permissions.all()
         if not permissions:
@@ -60,6 +80,41 @@ def view_permissions_by_id(request, id):
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('page_size', openapi.IN_QUERY, description="Number of items per page", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('cursor', openapi.IN_QUERY, description="next_cursor from the previous page", type=openapi.TYPE_STRING),
+])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@permission_required(['auth.view_permission'], raise_exception=True)
+def view_users_by_permission_id(request, id):   #user nào có quyền id (trực tiếp, qua group hoặc superuser)
+    try:
+        page_size = get_page_size(request)
+        cursor = request.query_params.get('cursor')
+        # OR giữa hai điều kiện khiến MySQL không dùng được index: phân trang riêng user có quyền
+        # (index (permission, user) của bảng quyền hiệu lực) và superuser (index (is_superuser, id)),
+        # ghép theo id rồi cắt trang. Mỗi phần lấy tối đa page_size dòng nên page_size dòng đầu là đúng.
+        fields = ('id', 'username', 'is_active', 'is_superuser')
+        granted, granted_cursor = cursor_paginate(
+            User.objects.filter(id__in=EffectivePermission.objects.filter(permission_id=id).values('user_id')).values(*fields),
+            cursor=cursor, page_size=page_size,
+        )
+        superusers, superuser_cursor = cursor_paginate(
+            User.objects.filter(is_superuser=True).values(*fields), cursor=cursor, page_size=page_size
+        )
+        merged = sorted({user['id']: user for user in granted + superusers}.values(), key=lambda user: user['id'])
+        user_page = merged[:page_size]
+        next_cursor = None
+        if len(merged) > page_size or granted_cursor or superuser_cursor:
+            next_cursor = encode_cursor('id', [user_page[-1]['id'], user_page[-1]['id']])
+        return Response({
+            'page_size': page_size,
+            'next_cursor': next_cursor,
+            'result': user_page,
+        }, status=200)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
 @swagger_auto_schema(methods=['post', 'put'], request_body=AddPermissionDto)
 @api_view(['POST', 'PUT'])
 @permission_classes([IsAuthenticated])
@@ -99,21 +154,20 @@ def delete_permission(request):
 
 @swagger_auto_schema(method='get', manual_parameters=[
     openapi.Parameter('page_size', openapi.IN_QUERY, description="Number of items per page", type=openapi.TYPE_INTEGER),
-    openapi.Parameter('page_number', openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('cursor', openapi.IN_QUERY, description="next_cursor from the previous page", type=openapi.TYPE_STRING),
 ])
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @permission_required(['auth.view_group'], raise_exception=True)
 def view_group(request):
     try:
-        group = Group.objects.prefetch_related('permissions').all()
-        page_size = int(request.query_params.get('page_size', 10))
-        page_number = int(request.query_params.get('page_number', 1))
-        paginator = Paginator(group, page_size)
-        group_page = paginator.get_page(page_number) if paginator.num_pages >= page_number else []
+        page_size = get_page_size(request)
+        group_page, next_cursor = cursor_paginate(
+            Group.objects.prefetch_related('permissions'), cursor=request.query_params.get('cursor'), page_size=page_size
+        )
         result = {
-            'page': page_number,
             'page_size': page_size,
+            'next_cursor': next_cursor,
             'result': [
                 {
                     'id': group.id,
@@ -203,3 +257,69 @@ def delete_group(request, id):
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
+def bulk_missing(data):
+    # kiểm tra toàn bộ id bằng một câu IN cho mỗi bảng
+    errors = {}
+    for field, model in (('user_ids', User), ('group_ids', Group), ('permission_ids', Permission)):
+        if data.get(field):
+            missing = bulk.missing_ids(model, data[field])
+            if missing:
+                errors[field] = missing
+    if errors:
+        return Response({'error': 'Not found', 'missing': errors}, status=400)
+    return None
+
+def bulk_permissions(request, apply):
+    serialize = BulkPermissionDto(data=request.data)
+    if not serialize.is_valid():
+        return Response(serialize.errors, status=400)
+    data = serialize.validated_data
+    error = bulk_missing(data)
+    if error is not None:
+        return error
+    with transaction.atomic():
+        users = apply(bulk.USER_PERMISSIONS, data['user_ids'], data['permission_ids'])
+        groups = apply(bulk.GROUP_PERMISSIONS, data['group_ids'], data['permission_ids'])
+        bulk.invalidate(data['user_ids'], data['group_ids'])
+    return Response({'users': users, 'groups': groups}, status=200)
+
+@swagger_auto_schema(method='post', request_body=BulkPermissionDto)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@permission_required(['auth.add_permission'], raise_exception=True)
+def bulk_add_permissions(request):   #gán nhiều quyền cho nhiều user/group, trả về số dòng được thêm
+    return bulk_permissions(request, bulk.assign)
+
+@swagger_auto_schema(method='delete', request_body=BulkPermissionDto)
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+@permission_required(['auth.delete_permission'], raise_exception=True)
+def bulk_delete_permissions(request):   #thu hồi nhiều quyền của nhiều user/group, trả về số dòng bị xóa
+    return bulk_permissions(request, bulk.revoke)
+
+def bulk_group_members(request, apply):
+    serialize = BulkGroupMemberDto(data=request.data)
+    if not serialize.is_valid():
+        return Response(serialize.errors, status=400)
+    data = serialize.validated_data
+    error = bulk_missing(data)
+    if error is not None:
+        return error
+    with transaction.atomic():
+        members = apply(bulk.USER_GROUPS, data['user_ids'], data['group_ids'])
+        bulk.invalidate(data['user_ids'])
+    return Response({'members': members}, status=200)
+
+@swagger_auto_schema(method='post', request_body=BulkGroupMemberDto)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@permission_required(['auth.change_group'], raise_exception=True)
+def bulk_add_group_members(request):
+    return bulk_group_members(request, bulk.assign)
+
+@swagger_auto_schema(method='delete', request_body=BulkGroupMemberDto)
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+@permission_required(['auth.change_group'], raise_exception=True)
+def bulk_delete_group_members(request):
+    return bulk_group_members(request, bulk.revoke)
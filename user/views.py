@@ -10,6 +10,7 @@ from user.models import User
 from django.contrib.auth.hashers import make_password
 from rest_framework.decorators import action, api_view, permission_classes
 from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.core.cache import cache
 from django.core.cache import caches
@@ -19,9 +20,15 @@ from celery import shared_task
 from smtplib import SMTPException
 import logging
 from DemoDjango.redis_client import redis_client
+from DemoDjango.caching import read_through, get_version, bump_version, page_key
+from DemoDjango.pagination import InvalidCursor, cursor_paginate, get_page_size
+from DemoDjango.conditional import make_etag, not_modified, set_validators
 
 logger = logging.getLogger('signup')
 
+USER_LIST_VERSION_KEY = 'user_list_version'
+USER_LIST_FIELDS = ('username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff')
+
 # Create your views here.
 class AuthViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
@@ -73,34 +80,51 @@ class UserViewSet(viewsets.ModelViewSet):
         serialize = UserSerializer(data=data, context={'request': request})
         if serialize.is_valid():
             serialize.save()
+            # các trang cache theo version cũ tự hết hạn
+            bump_version(USER_LIST_VERSION_KEY)
             redis_client.publish('register', serialize.data['id'])
             logger.info(f'create user {serialize.data["username"]} with  id={serialize.data['id']} success')
             return Response(serialize.data, status=201)
         return Response(serialize.errors, status=400)
 
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('page_size', openapi.IN_QUERY, description="Page size", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('cursor', openapi.IN_QUERY, description="next_cursor from the previous page", type=openapi.TYPE_STRING),
+    ])
     def list(self, request, *args, **kwargs):
-        cache_key = "list_user_info"
-        list_user = cache.get(cache_key)
-
-        if list_user:
-            print('get from cache done...')
-            return Response(list_user, status=200)
-        else:
-            print('Cache miss, fetching from database...')
-            users = User.objects.all()
-            result = [
-                {
-                    'username': user.username,
-                    'email': user.email,
-                    'first_name': user.first_name,
-                    'last_name': user.last_name,
-                    'is_active': user.is_active,
-                    'is_staff': user.is_staff,
-                }
-                for user in users
-            ]
-            cache.set(cache_key, list(result), timeout=300)
-            return Response(result, status=200)
+        try:
+            page_size = get_page_size(request)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=400)
+        cursor = request.GET.get('cursor')
+
+        # version tăng khi có user mới hoặc user được cập nhật, client đã có bản mới nhất nhận 304
+        version = get_version(USER_LIST_VERSION_KEY)
+        etag = make_etag('users', version, page_size, cursor)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        def load():
+            # chỉ lấy các cột trả về, phân trang keyset theo id, không load cả bảng user
+            users, next_cursor = cursor_paginate(
+                User.objects.values('id', *USER_LIST_FIELDS), cursor=cursor, page_size=page_size
+            )
+            return {
+                'next_cursor': next_cursor,
+                'result': [{field: user[field] for field in USER_LIST_FIELDS} for user in users],
+            }
+
+        try:
+            page = read_through(page_key('user_list', version, page_size=page_size, cursor=cursor), load, timeout=300)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=400)
+        response = {
+            'page_size': page_size,
+            'next_cursor': page['next_cursor'],
+            'result': page['result'],
+        }
+        return set_validators(Response(response, status=200), etag)
 
     #trùng register()
     def create(self, request, *args, **kwargs):
@@ -120,9 +144,7 @@ class UserViewSet(viewsets.ModelViewSet):
         user.is_active = request.data['is_active']
         user.is_staff = request.data['is_staff']
         user.save()
-        cache_key = "list_user_info"
-        if cache_key in cache:
-            cache.delete(cache_key)
+        bump_version(USER_LIST_VERSION_KEY)
         return Response({'message': 'User updated successfully'}, status=200)
 
 #email api test
@@ -225,6 +247,7 @@ def activate_account(user_id:int):
         user = User.objects.get(id=user_id)
         user.is_active = True
         user.save()
+        bump_version(USER_LIST_VERSION_KEY)
         logger.info(f'activate account for user {user.username} with id={user_id} success')
         return {'success' : 'Activate account success!'}
     except Exception as e: